@@ -1,7 +1,8 @@
 """
 Entry point for the Outsmart Arena LLM Battle
 Initialize logging, env variables and styling as needed
-Check if an Arena is in the session, and if not, create a new one using Arena.default()
+Give each session a key, and get its GameLoop from the SessionStore, which starts a new game with Arena.default()
+or brings back one that was evicted to disk, or shows that the budget is exhausted if no new game can start
 Delegate to a Display object to manage the drawing of the UI components
 
 To see it in action, run:
@@ -10,7 +11,11 @@ python -m streamlit run app.py
 
 from dotenv import load_dotenv
 import logging
-from game.arenas import Arena
+import uuid
+from game.budgets import BudgetExhausted
+from game.sessions import SessionStore
+from models.games import Game
+from models.stores import Store
 import streamlit as st
 from util.setup import setup_logger, STYLE
 from views.displays import Display
@@ -22,6 +27,13 @@ if "root" not in st.session_state:
 
 load_dotenv(override=True)
 
+if Store.is_configured():
+    try:
+        Game.prepare_database()
+    except Exception as e:
+        logging.error("Failed to prepare the database")
+        logging.error(e)
+
 st.set_page_config(
     layout="wide",
     page_title="Outsmart",
@@ -33,12 +45,14 @@ st.set_page_config(
 )
 st.markdown(STYLE, unsafe_allow_html=True)
 
-if "arena" not in st.session_state:
-    st.session_state.arena = Arena.default()
+if "session_key" not in st.session_state:
+    st.session_state.session_key = uuid.uuid4().hex
 
-if "auto_move" not in st.session_state:
-    st.session_state.auto_move = False
-    st.session_state.do_move = False
-arena = st.session_state.arena
+try:
+    loop = SessionStore.instance().get(st.session_state.session_key)
+except BudgetExhausted as e:
+    st.markdown("<h1 style='text-align: center;'>Outsmart</h1>", unsafe_allow_html=True)
+    st.error(f"{e}. Please come back later.")
+    st.stop()
 
-Display(arena).display_page()
+Display(loop).display_page()
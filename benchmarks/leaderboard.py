@@ -0,0 +1,73 @@
+"""
+Benchmark the leaderboard standings through the real store: a temporary SQLite database is filled with synthetic
+games through Game.save_many, which maintains the standings as each game is written, then Game.standings() reads
+them. For comparison, rebuild_standings aggregates them from every stored result, which is what each read would
+cost without the materialized standings.
+
+Run with:
+python -m benchmarks.leaderboard
+python -m benchmarks.leaderboard --sizes 10000 100000 1000000
+
+The database grows from 1 size to the next, so each size only saves the games it adds.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from typing import List
+from benchmarks.synthetic import stream_games
+
+SAVE_BATCH = 10_000
+READS = 20
+
+
+def run(sizes: List[int]) -> None:
+    """
+    Run the benchmark at each size and print a table of results
+    :param sizes: the numbers of stored games
+    """
+    os.environ.pop("MONGO_URI", None)
+    os.environ["OUTSMART_DB"] = os.path.join(tempfile.mkdtemp(), "leaderboard.db")
+    from models.games import Game
+
+    print(f"{'games':>10} {'save us/game':>13} {'standings ms':>13} {'rebuild ms':>11}")
+    saved = 0
+    for n in sorted(sizes):
+        saving = 0.0
+        batch = []
+        for index, game in enumerate(stream_games(n), start=1):
+            if index <= saved:
+                continue
+            batch.append(game)
+            if len(batch) == SAVE_BATCH or index == n:
+                start = time.perf_counter()
+                Game.save_many(batch)
+                saving += time.perf_counter() - start
+                batch = []
+        added = n - saved
+        saved = n
+
+        start = time.perf_counter()
+        for _ in range(READS):
+            Game.standings()
+        reading = (time.perf_counter() - start) / READS
+
+        start = time.perf_counter()
+        Game.rebuild_standings()
+        rebuilding = time.perf_counter() - start
+
+        print(
+            f"{n:>10,} {saving * 1e6 / max(added, 1):>13.2f} {reading * 1e3:>13.3f} {rebuilding * 1e3:>11.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
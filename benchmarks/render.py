@@ -0,0 +1,82 @@
+"""
+Benchmark the cost of rendering the page on a Streamlit rerun, with and without the decoded header image cached.
+This uses Streamlit's AppTest to run app.py headlessly, so no browser or LLM calls are involved; dummy API keys
+are set only so that the SDK clients can be constructed.
+
+Run with:
+python -m benchmarks.render
+python -m benchmarks.render --runs 50
+"""
+
+import argparse
+import base64
+import os
+import statistics
+import time
+from typing import Callable, List
+
+
+def timings(action: Callable[[], None], runs: int) -> List[float]:
+    """
+    :param action: what to time
+    :param runs: how many times to run it
+    :return: the elapsed milliseconds of each run
+    """
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        action()
+        results.append((time.perf_counter() - start) * 1000)
+    return results
+
+
+def decode() -> None:
+    """
+    What display_image used to do on every rerun
+    """
+    with open("outsmart_image_base64.txt", "r") as f:
+        base64.b64decode(f.read())
+
+
+def report(label: str, results: List[float]) -> None:
+    """
+    Print the median and 95th percentile of some timings
+    """
+    p95 = statistics.quantiles(results, n=20)[-1] if len(results) > 1 else results[0]
+    print(f"{label:>32} median {statistics.median(results):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def run(runs: int) -> None:
+    """
+    Time decoding the image, and full page reruns with the image cache cleared before each run, and left warm
+    :param runs: how many runs of each
+    """
+    from streamlit.testing.v1 import AppTest
+    from views.headers import image_bytes
+
+    for key in ["OPENAI_API_KEY", "GROQ_API_KEY", "ANTHROPIC_API_KEY", "GROK_API_KEY", "GOOGLE_API_KEY"]:
+        os.environ.setdefault(key, "benchmark")
+
+    report("decode image", timings(decode, runs))
+    report("cached image", timings(image_bytes, runs))
+
+    app = AppTest.from_file(os.path.abspath("app.py"), default_timeout=60)
+    app.run()
+
+    def uncached_rerun():
+        image_bytes.clear()
+        app.run()
+
+    report("page rerun, image decoded", timings(uncached_rerun, runs))
+    report("page rerun, image cached", timings(app.run, runs))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    run(args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+A reproducible benchmark suite for the hot paths of the game, the prompts, persistence and the leaderboard.
+Players are driven by a scripted LLM that answers instantly with seeded random moves, so games run
+without any network calls; stored games are synthetic, written to a temporary SQLite database.
+Cold start is measured as the time to import what the Streamlit app and the headless runner import,
+each in a fresh interpreter.
+
+Run with:
+python -m benchmarks.suite
+python -m benchmarks.suite --sizes 10000 100000 1000000
+python -m benchmarks.suite --save benchmarks/baselines/suite.json
+python -m benchmarks.suite --compare benchmarks/baselines/suite.json --tolerance 0.25
+
+With --compare, every measurement that is worse than the baseline by more than the tolerance is flagged
+and the exit code is 1. All measurements are "lower is better".
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import subprocess
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List
+from interfaces.llms import LLM
+from game.arenas import Arena
+from game.players import Player
+from game.referees import Referee
+from prompting.user import prompt
+from benchmarks.synthetic import NAMES, stream_games
+
+Results = Dict[str, float]
+
+# The modules imported by app.py and by the headless runner, before anything is shown or played
+STARTUP = {
+    "app": ["streamlit", "dotenv", "game.sessions", "models.games", "models.stores", "views.displays"],
+    "runner": ["game.runner"],
+}
+STARTUP_RUNS = 5
+
+
+class Scripted(LLM):
+    """
+    A synthetic LLM that responds immediately with a random, well formed move
+    """
+
+    model_names = ["scripted"]
+
+    def setup_client(self):
+        self.client = random.Random(f"{self.model_name}-{self.temperature}")
+
+    def send(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        """
+        :return: a move, giving to 1 random player and taking from another
+        """
+        give, take = self.client.sample(NAMES, 2)
+        move = {
+            "secret strategy": "Form an alliance with whoever gives to me, then turn on the leader. " * 3,
+            "give coin to": give,
+            "take coin from": take,
+            "private messages": {
+                name: f"{name}, let's both give to each other and take from {take}." for name in NAMES
+            },
+        }
+        return json.dumps(move)
+
+
+def best_us(action: Callable[[], None], repeat: int) -> float:
+    """
+    :param action: what to time
+    :param repeat: how many times to time it
+    :return: the fastest elapsed microseconds, which is the least sensitive to noise from the rest of the machine
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e6
+
+
+def scripted_arena() -> Arena:
+    """
+    :return: a new Arena of 4 players, all using the scripted LLM
+    """
+    random.seed(0)
+    players = [Player(name, "scripted", Arena.TEMPERATURE) for name in NAMES]
+    return Arena(players)
+
+
+def play(arena: Arena) -> None:
+    """
+    Run the arena's game to the end
+    """
+    while not arena.is_game_over:
+        arena.do_turn(lambda fraction, text: None)
+
+
+def play_turns(arena: Arena, turns: int = 10) -> None:
+    """
+    Run turns through the referee without checking for bankruptcy, so that there is a full history of records
+    Random scripted moves often bankrupt a player within a few turns, which would end a real game early
+    """
+    for turn in range(1, turns + 1):
+        arena.prepare_for_turn()
+        Referee(arena.players, turn).do_turn(lambda fraction, text: None)
+        for player in arena.players:
+            player.series.append(player.coins)
+    arena.turn = turns
+
+
+def referee(repeat: int) -> Results:
+    """
+    Time parse_response on scripted responses, and the resolution of a turn once every move is in
+    """
+    results = {}
+    arena = scripted_arena()
+    ref = Referee(arena.players, 1)
+    responses = [player.llm.send("", "", 0) for player in arena.players for _ in range(250)]
+    start = time.perf_counter()
+    for response in responses:
+        ref.parse_response(response)
+    results["referee.parse_response us/call"] = (time.perf_counter() - start) * 1e6 / len(responses)
+
+    def handle_turn():
+        turn = Referee(arena.players, 1)
+        for player in arena.players:
+            turn.records[player.name] = turn.do_turn_for_player(player)
+        turn.handle_turn()
+
+    def make_moves():
+        for player in arena.players:
+            Referee(arena.players, 1).do_turn_for_player(player)
+
+    moves = best_us(make_moves, repeat)
+    results["referee.handle_turn us/turn"] = max(best_us(handle_turn, repeat) - moves, 0.0)
+    results["arena.game ms/game"] = best_us(lambda: play(scripted_arena()), max(repeat // 20, 3)) / 1000
+    return results
+
+
+def prompting(repeat: int) -> Results:
+    """
+    Time building the user prompt at each turn of a full 10 turns, and record its size
+    """
+    results = {}
+    arena = scripted_arena()
+    play_turns(arena)
+    player = arena.players[0]
+    names = [other.name for other in player.others]
+    coins = [other.coins for other in player.others]
+    for turn in range(1, len(player.records) + 1):
+        records = player.records[: turn - 1]
+        text = prompt(player.name, names, coins, player.coins, turn, records)
+        results[f"prompting.prompt turn {turn:02} chars"] = len(text)
+        results[f"prompting.prompt turn {turn:02} us"] = best_us(
+            lambda: prompt(player.name, names, coins, player.coins, turn, records), repeat
+        )
+    return results
+
+
+def rendering(repeat: int) -> Results:
+    """
+    Time the chart table and the player report after a full 10 turns
+    """
+    arena = scripted_arena()
+    play_turns(arena)
+    return {
+        "arena.table us": best_us(arena.table, repeat),
+        "player.report us": best_us(arena.players[0].report, repeat),
+    }
+
+
+def leaderboard(sizes: List[int]) -> Results:
+    """
+    Time the leaderboard over a growing, temporary SQLite database of synthetic games
+    ratings_for replays an in-memory stream of games; rebuild_ratings replays them from the store; games_df
+    is timed with the version cache cleared but the ratings checkpoint current
+    """
+    os.environ.pop("MONGO_URI", None)
+    os.environ["OUTSMART_DB"] = os.path.join(tempfile.mkdtemp(), "suite.db")
+    from models.games import Game, cache
+
+    results = {}
+    saved = 0
+    for n in sorted(sizes):
+        batch = []
+        for index, game in enumerate(stream_games(n), start=1):
+            if index > saved:
+                batch.append(game)
+            if len(batch) == 10_000:
+                Game.save_many(batch)
+                batch = []
+        if batch:
+            Game.save_many(batch)
+        saved = n
+        df = Game.games_df()
+
+        start = time.perf_counter()
+        Game.ratings_for(stream_games(n), df)
+        results[f"game.ratings_for {n} s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        Game.rebuild_ratings()
+        results[f"game.rebuild_ratings {n} s"] = time.perf_counter() - start
+
+        cache.entries.clear()
+        start = time.perf_counter()
+        Game.games_df()
+        results[f"game.games_df {n} ms"] = (time.perf_counter() - start) * 1000
+    return results
+
+
+def startup() -> Results:
+    """
+    Time the imports of the app and of the runner, each in a fresh interpreter, taking the best of a few runs
+    """
+    results = {}
+    for name, modules in STARTUP.items():
+        code = f"import time; start = time.perf_counter(); import {', '.join(modules)}; print(time.perf_counter() - start)"
+        runs = [
+            float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+            for _ in range(STARTUP_RUNS)
+        ]
+        results[f"startup.{name} import ms"] = min(runs) * 1000
+    return results
+
+
+def compare(results: Results, baseline: Results, tolerance: float) -> List[str]:
+    """
+    :param results: this run
+    :param baseline: an earlier run
+    :param tolerance: the fraction by which a measurement may be worse before it's flagged
+    :return: a description of each regression
+    """
+    regressions = []
+    for name, value in results.items():
+        before = baseline.get(name)
+        if before and value > before * (1 + tolerance):
+            regressions.append(f"{name}: {before:.4g} -> {value:.4g} ({value / before - 1:+.0%})")
+    return regressions
+
+
+def run(sizes: List[int], repeat: int) -> Dict:
+    """
+    Run the whole suite
+    :param sizes: the numbers of stored games for the leaderboard benchmarks
+    :param repeat: how many times to repeat each of the quick measurements
+    :return: the results, with details of the machine they were measured on
+    """
+    results = {}
+    for part in [referee, prompting, rendering]:
+        results |= part(repeat)
+    results |= startup()
+    results |= leaderboard(sizes)
+    machine = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "run_date": datetime.now().isoformat(timespec="seconds"),
+    }
+    return {"machine": machine, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--save", help="write the results to this JSON file, as a new baseline")
+    parser.add_argument("--compare", help="compare the results with the baseline in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    run_results = run(args.sizes, args.repeat)
+    for name, value in run_results["results"].items():
+        print(f"{name:>40} {value:>14.4f}")
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(run_results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(run_results["results"], baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions against {args.compare}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Generate synthetic game history for benchmarks, so that they can run at scale without a database or any LLMs
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import List, Iterator
+from models.games import Result, Game
+
+MODELS = [
+    "gpt-5",
+    "gpt-5-nano",
+    "gpt-5-mini",
+    "claude-sonnet-4-5",
+    "claude-haiku-4-5",
+    "grok-4",
+    "grok-4-fast",
+    "gemini-2.5-flash",
+    "gemini-2.5-pro",
+    "openai/gpt-oss-120b",
+]
+NAMES = ["Alex", "Blake", "Charlie", "Drew"]
+
+
+def min_ranks(coins: List[int]) -> List[int]:
+    """
+    Rank the coins so that the most coins has rank 0, and ties share the lower rank
+    :param coins: the coins of each player
+    :return: the rank of each player
+    """
+    return [sum(1 for other in coins if other > coin) for coin in coins]
+
+
+def game_rows(n: int, seed: int = 42) -> Iterator[tuple]:
+    """
+    Generate the raw values for n games, without building any pydantic objects
+    :param n: the number of games
+    :param seed: the random seed, so that runs are reproducible
+    :return: an iterator of (run_date, llms, coins, ranks, alliances) tuples
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 8, 1)
+    for index in range(n):
+        llms = rng.sample(MODELS, len(NAMES))
+        coins = [rng.randint(0, 24) for _ in NAMES]
+        alliances = [sorted(rng.sample(NAMES, 2)) for _ in range(rng.randint(0, 2))]
+        yield start + timedelta(minutes=index), llms, coins, min_ranks(coins), alliances
+
+
+def stream_games(n: int, seed: int = 42) -> Iterator[Game]:
+    """
+    Generate n synthetic Game objects one at a time, so that millions of them don't need to fit in memory
+    :param n: the number of games
+    :param seed: the random seed, so that runs are reproducible
+    :return: an iterator of Games
+    """
+    for run_date, llms, coins, ranks, alliances in game_rows(n, seed):
+        results = [
+            Result(name=name, llm=llm, coins=coin, rank=rank)
+            for name, llm, coin, rank in zip(NAMES, llms, coins, ranks)
+        ]
+        yield Game(run_date=run_date, results=results, alliances=alliances)
+
+
+def games(n: int, seed: int = 42) -> List[Game]:
+    """
+    Generate n synthetic Game objects
+    :param n: the number of games
+    :param seed: the random seed, so that runs are reproducible
+    :return: a list of Games
+    """
+    return list(stream_games(n, seed))
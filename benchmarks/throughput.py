@@ -0,0 +1,90 @@
+"""
+Benchmark the throughput of many concurrent arenas over the real network path, against the local mock LLM server
+The real SDK clients of every provider talk HTTP to interfaces.mockserver, so connection handling, streaming,
+concurrency and retries are all included, with latencies and failures drawn from the configured distributions.
+No API calls are made and nothing is spent.
+
+Run with:
+python -m benchmarks.throughput
+python -m benchmarks.throughput --arenas 50 --p50 2 --p99 10 --error-rate 0.01 --rate-limit-rate 0.02
+"""
+
+import os
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from interfaces.mockserver import Behaviour, STRATEGIES, serve, environment
+
+KEYS = ["OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GROQ_API_KEY", "GROK_API_KEY", "GOOGLE_API_KEY"]
+
+
+def play(models: List[str]) -> List[float]:
+    """
+    Play 1 game against the mock server
+    :param models: the line-up
+    :return: the seconds taken by each turn
+    """
+    from game.runner import new_arena
+
+    arena = new_arena(models)
+    turns = []
+    while not arena.is_game_over:
+        start = time.perf_counter()
+        arena.do_turn(lambda fraction, text: None)
+        turns.append(time.perf_counter() - start)
+    return turns
+
+
+def run(arenas: int, games: int, models: List[str], behaviour: Behaviour) -> None:
+    """
+    Run games on many concurrent arenas and print the throughput and turn latencies
+    :param arenas: how many arenas play at once
+    :param games: how many games in total
+    :param models: the line-up for every game
+    :param behaviour: how the mock server responds
+    """
+    server = serve(behaviour, port=0)
+    os.environ.update(environment(server))
+    for key in KEYS:
+        os.environ.setdefault(key, "mock")
+    os.environ.pop("MONGO_URI", None)
+    os.environ.pop("OUTSMART_DB", None)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=arenas) as executor:
+        results = list(executor.map(play, [models] * games))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    turns = sorted(turn for result in results for turn in result)
+    p50 = statistics.median(turns)
+    p99 = turns[min(len(turns) - 1, int(len(turns) * 0.99))]
+    print(f"{games} games, {len(turns)} turns on {arenas} concurrent arenas in {elapsed:.1f}s")
+    print(f"{games / elapsed:.2f} games/s, {len(turns) / elapsed:.2f} turns/s")
+    print(f"turn latency p50 {p50:.2f}s, p99 {p99:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--arenas", type=int, default=10, help="how many arenas play at once")
+    parser.add_argument("--games", type=int, help="how many games in total; defaults to 1 per arena")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=["gpt-5-nano", "claude-haiku-4-5", "grok-4-fast", "openai/gpt-oss-120b"],
+    )
+    parser.add_argument("--strategy", choices=list(STRATEGIES), default="random")
+    parser.add_argument("--p50", type=float, default=0.5)
+    parser.add_argument("--p99", type=float, default=2.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    behaviour = Behaviour(args.strategy, args.p50, args.p99, args.jitter, args.error_rate, args.rate_limit_rate, seed=0)
+    run(args.arenas, args.games or args.arenas, args.models, behaviour)
+
+
+if __name__ == "__main__":
+    main()
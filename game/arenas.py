@@ -1,15 +1,23 @@
 import os
 import logging
-from typing import List, Self, Callable
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Self, Callable
 from game.players import Player
 from game.referees import Referee
 import random
-import pandas as pd
 import math
-from scipy.stats import rankdata
+import uuid
 from models.games import Result, Game
+from models.writer import GameWriter
+from models.stores import Store
+from models.transcripts import Transcript, PlayerTranscript
+from models.snapshots import SnapshotRefresher
 from datetime import datetime
 from interfaces.llms import LLM
+from game.budgets import Budget, BudgetExhausted
+from util import tracing, profiling, metrics, feeds
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 ProgressCallback = Callable[[float, str], None]
 
@@ -22,9 +30,11 @@ class Arena:
     players: List[Player]
     turn: int
     is_game_over: bool
+    game_id: str
 
     NAMES = ["Alex", "Blake", "Charlie", "Drew", "Eden", "Fallon", "Gale", "Harper"]
     TEMPERATURE = 0.7
+    LINEUP_ATTEMPTS = 20
 
     def __init__(self, players: List[Player]):
         """
@@ -40,6 +50,7 @@ class Arena:
             player.others = others
         self.turn = 1
         self.is_game_over = False
+        self.game_id = uuid.uuid4().hex
 
     def __repr__(self) -> str:
         """
@@ -50,23 +61,106 @@ class Arena:
             result += f"{player}\n"
         return result
 
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: a plain dictionary of the state of this game, suitable for storing as JSON
+        """
+        return {
+            "game_id": self.game_id,
+            "turn": self.turn,
+            "is_game_over": self.is_game_over,
+            "players": [player.to_dict() for player in self.players],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> Self:
+        """
+        Recreate an Arena from its state, keeping the order in which each player sees the others
+        :param d: a dictionary created by to_dict
+        :return: the Arena it represents
+        """
+        players = [Player.from_dict(player) for player in d["players"]]
+        arena = cls(players)
+        arena.load_state(d)
+        return arena
+
+    def load_state(self, d: Dict[str, Any]) -> None:
+        """
+        Bring this Arena up to date with the state of the same game, such as after a turn played elsewhere,
+        keeping the players' LLM clients
+        :param d: a dictionary created by to_dict
+        """
+        by_name = {player.name: player for player in self.players}
+        for state in d["players"]:
+            player = by_name[state["name"]]
+            player.load_state(state)
+            player.others = [by_name[name] for name in state["others"]]
+        self.game_id = d["game_id"]
+        self.turn = d["turn"]
+        self.is_game_over = d["is_game_over"]
+
+    def alliances(self) -> List[List[str]]:
+        """
+        :return: the pair of player names for each alliance formed during the game
+        """
+        pairs = []
+        for player in self.players:
+            for record in player.records:
+                pairs.extend([player.name, ally] for ally in record.alliances_with if player.name < ally)
+        return pairs
+
+    def cost(self) -> float:
+        """
+        :return: the dollars spent on LLM calls so far in this game
+        """
+        return sum(player.cost for player in self.players)
+
+    def transcript(self) -> Transcript:
+        """
+        :return: the full transcript of every player's turns, to be stored alongside the results
+        """
+        players = [
+            PlayerTranscript(
+                name=player.name,
+                llm=player.llm.model_name,
+                temperature=player.llm.temperature,
+                records=[record.to_dict() for record in player.records],
+            )
+            for player in self.players
+        ]
+        return Transcript(game_id=self.game_id, players=players)
+
     def do_save_game(self, names: List[str], llms: List[str], coins: List[int], ranks: List[int]):
+        """
+        Hand the game and its transcript to the background writer, so that the end of the game doesn't wait on the database
+        """
         results = []
         for name, llm, coin, rank in zip(names, llms, coins, ranks):
             r = Result(name=name, llm=llm, coins=coin, rank=rank)
             results.append(r)
-        game = Game(run_date=datetime.now(), results=results)
-        game.save()
+        game = Game(
+            run_date=datetime.now(), results=results, alliances=self.alliances(), game_id=self.game_id
+        )
+        GameWriter.instance().submit(game, self.transcript())
+
+    @staticmethod
+    def ranks(coins: List[int]) -> List[int]:
+        """
+        Rank the players so that the most coins has rank 0, and ties share the lower rank
+        :param coins: the coins of each player
+        :return: the rank of each player
+        """
+        return [sum(1 for other in coins if other > coin) for coin in coins]
 
     def save_game(self):
-        if os.getenv("MONGO_URI"):
+        if Store.is_configured():
             try:
-                names = [player.name for player in self.players]
-                llms = [player.llm.model_name for player in self.players]
-                coins = [player.coins for player in self.players]
-                ranks = rankdata([-coin for coin in coins], method="min") - 1
-                ranks = list(ranks.astype(int))
-                self.do_save_game(names, llms, coins, ranks)
+                with tracing.span("arena.save_game"):
+                    names = [player.name for player in self.players]
+                    llms = [player.llm.model_name for player in self.players]
+                    coins = [player.coins for player in self.players]
+                    ranks = self.ranks(coins)
+                    self.do_save_game(names, llms, coins, ranks)
             except Exception as e:
                 logging.error("Failed to save game results")
                 logging.error(e)
@@ -74,6 +168,7 @@ class Arena:
     def handle_game_over(self):
         """The game has ended - figure out who's a winner; there could be multiple"""
         self.is_game_over = True
+        metrics.GAMES.inc()
         winning_coins = max(player.coins for player in self.players)
         for player in self.players:
             if player.coins == winning_coins:
@@ -114,15 +209,95 @@ class Arena:
 
     def do_turn(self, progress: ProgressCallback) -> bool:
         """
-        Carry out a Turn by delegating to a Referee object
+        Carry out a Turn, traced and profiled if either is switched on
         :param progress: a callback on which to report progress
         :return True if the game ended
         """
-        self.prepare_for_turn()
+        turn = self.turn
+        self.spectate()
+        with tracing.context(game_id=self.game_id, turn=turn), tracing.span("arena.do_turn"):
+            profiling.run_turn(self.game_id, turn, lambda: self.play_turn(progress))
+        if feeds.is_enabled():
+            feeds.publish(self.game_id, "turn", self.turn_event(turn))
+        if self.is_game_over:
+            profiling.finish_game(self.game_id)
+            if feeds.is_enabled():
+                feeds.publish(self.game_id, feeds.FINAL, self.game_over_event())
+        return self.is_game_over
+
+    def spectate(self) -> Optional[str]:
+        """
+        Open the spectator feed of this game, if feeds are on, starting it with the line-up
+        :return: where spectators can follow the game, or None if feeds are off
+        """
+        hub = feeds.hub()
+        if hub is None:
+            return None
+        if hub.feed(self.game_id) is None:
+            hub.publish(self.game_id, "start", self.start_event())
+        return feeds.url(self.game_id)
+
+    def start_event(self) -> Dict[str, Any]:
+        """
+        :return: the line-up, for spectators
+        """
+        players = [{"name": p.name, "llm": p.llm.model_name, "coins": p.coins} for p in self.players]
+        return {"game_id": self.game_id, "turn": self.turn, "players": players}
+
+    def turn_event(self, turn: int) -> Dict[str, Any]:
+        """
+        The results of a turn for spectators: coins, gives and takes, alliances and the private messages,
+        which are revealed once the turn is over; secret strategies are kept until the end of the game
+        :param turn: the turn that has just been played
+        :return: the event
+        """
+        players = []
+        alliances = []
+        messages = []
+        for player in self.players:
+            record = player.records[-1] if player.records and player.records[-1].turn == turn else None
+            move = record.move if record and not record.is_invalid_move else None
+            players.append(
+                {
+                    "name": player.name,
+                    "coins": player.coins,
+                    "delta": player.coins - player.prior_coins,
+                    "gave_to": move.give if move else None,
+                    "took_from": move.take if move else None,
+                    "is_invalid_move": move is None,
+                    "is_dead": player.is_dead,
+                }
+            )
+            if record:
+                alliances.extend([player.name, ally] for ally in record.alliances_with if player.name < ally)
+            if move:
+                messages.extend({"from": player.name, "to": to, "text": text} for to, text in move.messages.items())
+        return {"turn": turn, "players": players, "alliances": alliances, "messages": messages}
+
+    def game_over_event(self) -> Dict[str, Any]:
+        """
+        :return: the final standings and every player's secret strategy each turn, for spectators
+        """
+        return {
+            "winners": [player.name for player in self.players if player.is_winner],
+            "coins": {player.name: player.coins for player in self.players},
+            "strategies": {
+                player.name: [record.move.strategy if record.move else None for record in player.records]
+                for player in self.players
+            },
+        }
+
+    def play_turn(self, progress: ProgressCallback) -> None:
+        """
+        Carry out a Turn by delegating to a Referee object
+        :param progress: a callback on which to report progress
+        """
+        with tracing.span("arena.prepare_for_turn"):
+            self.prepare_for_turn()
         ref = Referee(self.players, self.turn)
         ref.do_turn(progress)
         self.process_turn_outcome()
-        return self.is_game_over
+        metrics.TURNS.inc()
 
     @classmethod
     def model_names(cls) -> List[str]:
@@ -130,20 +305,31 @@ class Arena:
         Determine the list of model names to use in a new Arena
         If there's an environment variable ARENA=random then pick 4 random model names
         otherwise use 4 cheap models
+        If there's a spending limit, line-ups that would take the spend too near it are skipped
         The arena should support 3 or more names, although only 4 has been tested
         :return: a list of names of LLMs for a new Arena
+        :raises BudgetExhausted: if no line-up fits within the spending limit
         """
+        budget = Budget.instance()
         arena_type = os.getenv("ARENA")
         if arena_type == "random":
-            return random.sample(LLM.all_model_names(), 4)
+            for _ in range(cls.LINEUP_ATTEMPTS):
+                names = random.sample(LLM.all_model_names(), 4)
+                if budget.affords(names):
+                    return names
         else:
-            return [
+            names = [
                 "openai/gpt-oss-120b",
                 "gpt-5-nano",
                 # "gemini-2.5-pro",
                 "grok-4-fast",
                 "claude-haiku-4-5",
             ]
+            if budget.affords(names):
+                return names
+        raise BudgetExhausted(
+            f"The spend of ${budget.spent:.2f} is near the budget of ${budget.ceiling:.2f}, so no new game can start"
+        )
 
     @classmethod
     def default(cls) -> Self:
@@ -162,13 +348,15 @@ class Arena:
     def turn_name(self) -> str:
         return f"Turn {self.turn}"
 
-    def table(self) -> pd.DataFrame:
+    def table(self) -> "pd.DataFrame":
         """
         Create the table of coins by turn that will be used to make a line chart of each player
         Use NaN to fill up each row to 10 datapoints so that the axes display properly;
         The NaN values don't show on the line chart
         :return: a dataframe that shows how each players' coins have evolved during the game
         """
+        import pandas as pd
+
         d = {}
         padding = [math.nan] * (11 - self.turn)
         for player in self.players:
@@ -177,7 +365,7 @@ class Arena:
         return pd.DataFrame(data=d, index=range(11))
 
     @staticmethod
-    def rankings() -> pd.DataFrame:
+    def rankings() -> "pd.DataFrame":
         """
         Create the leaderboard, delegating to the Game business object to handle this
         :return: a dataframe with the leaderboard info
@@ -189,9 +377,35 @@ class Arena:
         return df
 
     @staticmethod
-    def latest() -> pd.DataFrame:
+    def head_to_head(metric: str) -> "pd.DataFrame":
+        """
+        Create the matrix of how models have fared against each other, for the models currently supported
+        :param metric: which measure to show
+        :return: a dataframe with a row for each model and a column for each opponent
+        """
+        df = Game.head_to_head_df(metric)
+        supported_models = [llm for llm in LLM.all_model_names() if llm in df.index]
+        return df.loc[supported_models, [llm for llm in supported_models if llm in df.columns]]
+
+    @staticmethod
+    def latest() -> "pd.DataFrame":
         """
         Create the table of last N games, delegating to the Game business object
         :return: a dataframe with the most recent results of games
         """
         return Game.latest_df()
+
+    @staticmethod
+    def leaderboard_frames() -> Dict[str, "pd.DataFrame"]:
+        """
+        Build the tables of the leaderboard that are shown from a prebuilt snapshot
+        :return: the rankings and latest games, keyed by name
+        """
+        return {"rankings": Arena.rankings(), "latest": Arena.latest()}
+
+    @staticmethod
+    def leaderboard() -> SnapshotRefresher:
+        """
+        :return: the background refresher that keeps a snapshot of the leaderboard, starting it on first use
+        """
+        return SnapshotRefresher.instance(Arena.leaderboard_frames)
@@ -0,0 +1,164 @@
+"""
+A spending limit across games, so that expensive line-ups are skipped once the spend gets near the ceiling, and no
+new games are started once no line-up fits
+Set OUTSMART_BUDGET to a number of dollars, or pass --budget to the headless runner. The cost of every call is
+added to a total kept in a small SQLite file, OUTSMART_SPEND (outsmart_spend.db by default), as it's made, so the
+app, the runner and the worker processes all count against the same limit, and games that are abandoned or fail
+are counted too. Each model's cost per call is averaged from this process's calls so far, falling back on the price
+table's estimate.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Self, Tuple
+from interfaces.prices import typical_cost
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised when a new game can't be started, as no line-up would stay clear of the spending limit
+    """
+
+
+class Budget:
+    """
+    Tracks the spend against a ceiling, and estimates what a game would cost
+    Use Budget.instance() to get the 1 budget for this process
+    """
+
+    ceiling: Optional[float]
+    path: str
+    calls: Dict[str, Tuple[int, float]]
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS spend (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        spent REAL NOT NULL
+    );
+    """
+
+    TURNS = 10
+    NEAR = 0.9
+    DEFAULT_PATH = "outsmart_spend.db"
+    LEGACY_PATH = "outsmart_spend.json"
+
+    _instance: Optional[Self] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, ceiling: Optional[float], path: str):
+        """
+        :param ceiling: the most to spend in dollars, or None for no limit
+        :param path: the SQLite file that keeps the amount spent
+        """
+        self.ceiling = ceiling
+        self.path = path
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @classmethod
+    def instance(cls) -> Self:
+        """
+        :return: the budget for this process, creating it on first use
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                ceiling = os.getenv("OUTSMART_BUDGET")
+                path = os.getenv("OUTSMART_SPEND", cls.DEFAULT_PATH)
+                cls._instance = cls(float(ceiling) if ceiling else None, path)
+            return cls._instance
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        SQLite connections can't be shared between threads, so each thread gets its own
+        The first connection to a new file carries over the spend from the JSON file of earlier versions
+        :return: the connection for the calling thread
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.SCHEMA)
+            with connection:
+                connection.execute("INSERT OR IGNORE INTO spend (id, spent) VALUES (1, ?)", (self.legacy_spend(),))
+            self.local.connection = connection
+        return connection
+
+    def legacy_spend(self) -> float:
+        """
+        :return: the amount spent as kept by earlier versions, or 0 if there's no such file
+        """
+        if not os.path.exists(self.LEGACY_PATH):
+            return 0.0
+        with open(self.LEGACY_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("spent", 0.0)
+
+    @property
+    def spent(self) -> float:
+        """
+        :return: the amount spent by every process sharing the file, or 0 if there's no limit to track it against
+        """
+        if not self.ceiling:
+            return 0.0
+        return self.connection.execute("SELECT spent FROM spend WHERE id = 1").fetchone()[0]
+
+    def record_call(self, model_name: str, dollars: float) -> None:
+        """
+        Account for the cost of 1 call, as soon as it's made: add it to the amount spent, and to the running
+        average for its model
+        """
+        with self.lock:
+            count, total = self.calls.get(model_name, (0, 0.0))
+            self.calls[model_name] = (count + 1, total + dollars)
+        self.add(dollars)
+
+    def add(self, dollars: float) -> None:
+        """
+        Add to the amount spent, in a single atomic update, so that processes sharing the file never lose each
+        other's spend
+        """
+        if not self.ceiling:
+            return
+        with self.connection as connection:
+            connection.execute("UPDATE spend SET spent = spent + ? WHERE id = 1", (dollars,))
+
+    def cost_per_call(self, model_name: str) -> float:
+        """
+        :return: the average cost of a call to this model so far, or an estimate if there haven't been any
+        """
+        with self.lock:
+            count, total = self.calls.get(model_name, (0, 0.0))
+        return total / count if count else typical_cost(model_name)
+
+    def estimate(self, model_names: List[str]) -> float:
+        """
+        :param model_names: a line-up
+        :return: what a full game with this line-up would be expected to cost
+        """
+        return self.TURNS * sum(self.cost_per_call(model_name) for model_name in model_names)
+
+    def remaining(self) -> float:
+        """
+        :return: how much can still be spent before getting near the ceiling
+        """
+        if not self.ceiling:
+            return float("inf")
+        return self.ceiling * self.NEAR - self.spent
+
+    def affords(self, model_names: List[str]) -> bool:
+        """
+        :return: True if a game with this line-up is expected to stay clear of the ceiling
+        """
+        return self.estimate(model_names) <= self.remaining()
+
+    def is_exhausted(self) -> bool:
+        """
+        :return: True if the spend is near the ceiling
+        """
+        return self.remaining() <= 0
@@ -0,0 +1,320 @@
+"""
+A local job queue, so that games are played by worker processes rather than by the web server
+Set OUTSMART_JOBS to the path of a SQLite file, and start workers with python -m game.workers, then each Run Turn
+or Run Game in the app is queued as a job that carries the state of the arena. A worker claims the job, plays the
+turns, and writes the arena back after each turn, along with its progress and the players' drafts as they stream.
+The app polls the job for its state, so the web tier and game throughput can be scaled independently, within 1
+host: the app and the workers must share the SQLite file locally, as WAL mode doesn't work over a network filesystem.
+
+A worker that dies mid-turn stops updating its job; once the job is STALE_SECONDS old it's queued again, to carry
+on from the last turn that was written back. Every write from a worker is made only while the job is still claimed
+by that worker, so a worker that was merely slow finds out that it has lost the job and stops, rather than
+overwriting the state written by the worker that took it over.
+
+Workers also pass their games' spectator events through the queue, and the app relays them to its feed server, so
+each game's feed is served from 1 place whichever workers play its turns.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Self
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job(BaseModel):
+    """
+    A request to play turns of 1 game, without the state of the arena
+    """
+
+    id: int
+    turns: Optional[int]
+    status: str
+    version: int
+    fraction: float
+    progress: str
+    drafts: Dict[str, str]
+    cancel: bool
+    error: Optional[str]
+
+    @property
+    def is_active(self) -> bool:
+        """
+        :return: True if the job is waiting for a worker or being worked on
+        """
+        return self.status in (QUEUED, RUNNING)
+
+
+class JobQueue:
+    """
+    Jobs in a SQLite file, shared by the app and the worker processes
+    Use JobQueue.instance() to get the queue configured by the environment
+    """
+
+    path: str
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        turns INTEGER,
+        status TEXT NOT NULL,
+        state TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0,
+        fraction REAL NOT NULL DEFAULT 0,
+        progress TEXT NOT NULL DEFAULT '',
+        drafts TEXT NOT NULL DEFAULT '{}',
+        cancel INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        worker TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        game_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS events_created ON events (created);
+    """
+
+    COLUMNS = "id, turns, status, version, fraction, progress, drafts, cancel, error"
+    STALE_SECONDS = 60
+    KEEP_SECONDS = 24 * 60 * 60
+    RELAY_SECONDS = 0.5
+    REPLAY_SECONDS = 60 * 60
+
+    _instance: Optional[Self] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        """
+        :param path: the SQLite file
+        """
+        self.path = path
+        self.local = threading.local()
+        self.relaying = False
+        self.relay_lock = threading.Lock()
+        with self.connection as connection:
+            connection.executescript(self.SCHEMA)
+
+    @classmethod
+    def is_configured(cls) -> bool:
+        """
+        :return: True if games should be played by worker processes
+        """
+        return bool(os.getenv("OUTSMART_JOBS"))
+
+    @classmethod
+    def instance(cls) -> Self:
+        """
+        :return: the queue for this process, creating it on first use
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(os.getenv("OUTSMART_JOBS"))
+            return cls._instance
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        SQLite connections can't be shared between threads, so each thread gets its own
+        :return: the connection for the calling thread
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def to_job(row: tuple) -> Job:
+        id, turns, status, version, fraction, progress, drafts, cancel, error = row
+        return Job(
+            id=id,
+            turns=turns,
+            status=status,
+            version=version,
+            fraction=fraction,
+            progress=progress,
+            drafts=json.loads(drafts),
+            cancel=bool(cancel),
+            error=error,
+        )
+
+    def submit(self, state: Dict[str, Any], turns: Optional[int]) -> int:
+        """
+        Queue turns of a game to be played
+        :param state: the arena, from Arena.to_dict()
+        :param turns: how many turns to play, or None to play until the game is over
+        :return: the id of the job
+        """
+        now = time.time()
+        with self.connection as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (turns, status, state, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (turns, QUEUED, json.dumps(state), now, now),
+            )
+        return cursor.lastrowid
+
+    def job(self, job_id: int) -> Optional[Job]:
+        """
+        :return: the job, without the state of its arena, or None if there's no such job
+        """
+        row = self.connection.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self.to_job(row) if row else None
+
+    def state(self, job_id: int) -> Dict[str, Any]:
+        """
+        :return: the arena of the job, as of its last completed turn
+        """
+        row = self.connection.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0])
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """
+        Take the oldest queued job, first queueing again any job whose worker has gone quiet
+        :param worker: identifies the worker, which must pass the same name with each later write to the job
+        :return: the job, now running, or None if there's nothing to do
+        """
+        now = time.time()
+        with self.connection as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND updated < ?",
+                (QUEUED, RUNNING, now - self.STALE_SECONDS),
+            )
+            row = connection.execute(
+                f"UPDATE jobs SET status = ?, worker = ?, updated = ? "
+                f"WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY id LIMIT 1) RETURNING {self.COLUMNS}",
+                (RUNNING, worker, now, QUEUED),
+            ).fetchone()
+        return self.to_job(row) if row else None
+
+    def report(self, job_id: int, worker: str, fraction: float, progress: str, drafts: Dict[str, str]) -> bool:
+        """
+        Record the progress of the turn being played; this also shows that the worker is still alive
+        :param worker: the worker that claimed the job
+        :return: True if the worker should stop, as the job has been asked to stop or has been handed to another worker
+        """
+        with self.connection as connection:
+            row = connection.execute(
+                "UPDATE jobs SET fraction = ?, progress = ?, drafts = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = ? RETURNING cancel",
+                (fraction, progress, json.dumps(drafts), time.time(), job_id, worker, RUNNING),
+            ).fetchone()
+        return row is None or bool(row[0])
+
+    def save_state(self, job_id: int, worker: str, state: Dict[str, Any]) -> bool:
+        """
+        Write back the arena after a turn, counting the turn off the job
+        :param worker: the worker that claimed the job
+        :param state: the arena, from Arena.to_dict()
+        :return: False if the job has been handed to another worker, so nothing was written
+        """
+        with self.connection as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = ?, version = version + 1, turns = turns - 1, drafts = '{}', updated = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (json.dumps(state), time.time(), job_id, worker, RUNNING),
+            )
+        return cursor.rowcount > 0
+
+    def finish(self, job_id: int, worker: str, status: str, error: Optional[str] = None) -> bool:
+        """
+        :param worker: the worker that claimed the job
+        :param status: DONE, FAILED or CANCELLED
+        :param error: what went wrong, if the job failed
+        :return: False if the job has been handed to another worker, so nothing was written
+        """
+        with self.connection as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, fraction = 0, progress = '', updated = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (status, error, time.time(), job_id, worker, RUNNING),
+            )
+        return cursor.rowcount > 0
+
+    def cancel(self, job_id: int) -> None:
+        """
+        Ask a job to stop: a queued job is cancelled straight away, a running one after its current turn
+        """
+        with self.connection as connection:
+            connection.execute("UPDATE jobs SET cancel = 1 WHERE id = ?", (job_id,))
+            connection.execute("UPDATE jobs SET status = ? WHERE id = ? AND status = ?", (CANCELLED, job_id, QUEUED))
+
+    def purge(self) -> None:
+        """
+        Delete jobs that finished, and spectator events that were published, more than KEEP_SECONDS ago
+        """
+        cutoff = time.time() - self.KEEP_SECONDS
+        with self.connection as connection:
+            connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated < ?", (DONE, FAILED, CANCELLED, cutoff)
+            )
+            connection.execute("DELETE FROM events WHERE created < ?", (cutoff,))
+
+    def publish(self, game_id: str, kind: str, data: Dict[str, Any]) -> None:
+        """
+        Pass on a spectator event from a worker, to be relayed to viewers by the app; see util.feeds
+        :param game_id: the game
+        :param kind: the type of event
+        :param data: the event
+        """
+        with self.connection as connection:
+            connection.execute(
+                "INSERT INTO events (game_id, kind, data, created) VALUES (?, ?, ?, ?)",
+                (game_id, kind, json.dumps(data), time.time()),
+            )
+
+    def relay(self, publish: Callable[[str, str, Dict[str, Any]], None]) -> None:
+        """
+        Start a thread, once per process, that passes on the events published by the workers as they arrive,
+        starting with those of the last REPLAY_SECONDS so that games already under way are complete
+        :param publish: called with the game_id, kind and data of each event
+        """
+        with self.relay_lock:
+            if self.relaying:
+                return
+            self.relaying = True
+        threading.Thread(target=self.follow, args=(publish,), name="event-relay", daemon=True).start()
+
+    def follow(self, publish: Callable[[str, str, Dict[str, Any]], None]) -> None:
+        """
+        The body of the relay thread
+        """
+        query = "SELECT COALESCE(MIN(id) - 1, (SELECT COALESCE(MAX(id), 0) FROM events)) FROM events WHERE created > ?"
+        last = self.connection.execute(query, (time.time() - self.REPLAY_SECONDS,)).fetchone()[0]
+        while True:
+            rows = []
+            try:
+                rows = self.connection.execute(
+                    "SELECT id, game_id, kind, data FROM events WHERE id > ? ORDER BY id LIMIT 1000", (last,)
+                ).fetchall()
+                for event_id, game_id, kind, data in rows:
+                    publish(game_id, kind, json.loads(data))
+                    last = event_id
+            except Exception:
+                logger.exception("Failed to relay spectator events")
+            if not rows:
+                time.sleep(self.RELAY_SECONDS)
+
+    def counts(self) -> Dict[str, int]:
+        """
+        :return: the number of jobs with each status
+        """
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
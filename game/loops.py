@@ -0,0 +1,200 @@
+"""
+Run the turns of a game on a background thread, so that a script rerun never blocks while the LLMs think
+Each browser session has its own GameLoop wrapped around its Arena. The UI starts a single turn or the rest of
+the game, then polls the loop's progress from fragments that refresh on their own, rather than rerunning the
+whole page for every turn.
+When OUTSMART_JOBS is set, a QueuedLoop takes the place of the GameLoop: it queues the turns for worker processes,
+and follows the job's progress and state, so the UI works the same either way.
+"""
+
+import logging
+import threading
+from typing import Optional, Tuple, Union
+from game.arenas import Arena
+from game.jobs import JobQueue, Job, QUEUED
+from util import feeds
+
+logger = logging.getLogger(__name__)
+
+
+class GameLoop:
+    """
+    A background worker that runs turns of 1 Arena
+    """
+
+    arena: Arena
+    thread: Optional[threading.Thread]
+    fraction: float
+    status: str
+    error: Optional[Exception]
+
+    def __init__(self, arena: Arena):
+        """
+        :param arena: the arena whose turns this loop runs
+        """
+        self.arena = arena
+        self.thread = None
+        self.fraction = 0.0
+        self.status = ""
+        self.error = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if turns are being run in the background right now
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def progress(self) -> Tuple[float, str]:
+        """
+        :return: how far through the current turn the players are, and a description
+        """
+        with self.lock:
+            return self.fraction, self.status
+
+    def report(self, fraction: float, status: str) -> None:
+        """
+        The progress callback passed to the Arena; it's called from the worker threads
+        """
+        with self.lock:
+            self.fraction = fraction
+            self.status = status
+
+    def start(self, turns: Optional[int] = None) -> bool:
+        """
+        Run turns in the background, unless the loop is already running or the game is over
+        :param turns: how many turns to run, or None to run until the game is over
+        :return: True if the loop was started
+        """
+        if self.is_running or self.arena.is_game_over:
+            return False
+        self.error = None
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, args=(turns,), name="game-loop", daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self, turns: Optional[int]) -> None:
+        """
+        The body of the background thread
+        :param turns: how many turns to run, or None to run until the game is over
+        """
+        remaining = turns
+        try:
+            while not self.arena.is_game_over and not self.stopping.is_set():
+                if remaining is not None:
+                    if remaining == 0:
+                        break
+                    remaining -= 1
+                logger.info(f"Kicking off turn {self.arena.turn}")
+                self.report(0.0, "Kicking off turn")
+                self.arena.do_turn(self.report)
+        except Exception as e:
+            logger.error("Game loop failed")
+            logger.error(e)
+            self.error = e
+        finally:
+            self.report(0.0, "")
+
+    def stop(self) -> None:
+        """
+        Ask the loop to stop once the current turn has finished; a turn in flight can't be interrupted
+        """
+        self.stopping.set()
+
+
+class QueuedLoop:
+    """
+    Runs turns of 1 Arena by queueing them for the worker processes, and brings the arena up to date as they're played
+    """
+
+    arena: Arena
+    queue: JobQueue
+    job: Optional[Job]
+    error: Optional[str]
+
+    def __init__(self, arena: Arena, queue: JobQueue):
+        """
+        :param arena: the arena whose turns are queued
+        :param queue: the queue that the workers take jobs from
+        """
+        self.arena = arena
+        self.queue = queue
+        self.job = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """
+        Check on the job, loading the arena again if a turn has been played since the last check
+        The drafts of players who are still thinking are copied across as they stream in
+        """
+        with self.lock:
+            if self.job is None or not self.job.is_active:
+                return
+            job = self.queue.job(self.job.id)
+            if job.version != self.job.version:
+                self.arena.load_state(self.queue.state(job.id))
+            for player in self.arena.players:
+                player.is_thinking = player.name in job.drafts
+                player.draft = job.drafts.get(player.name, "")
+            self.error = job.error
+            self.job = job
+
+    @property
+    def is_running(self) -> bool:
+        """
+        :return: True if the turns are waiting for a worker or being played
+        """
+        self.refresh()
+        return self.job is not None and self.job.is_active
+
+    def progress(self) -> Tuple[float, str]:
+        """
+        :return: how far through the current turn the players are, and a description
+        """
+        self.refresh()
+        if self.job is None:
+            return 0.0, ""
+        if self.job.status == QUEUED:
+            return 0.0, "Waiting for a worker"
+        return self.job.fraction, self.job.progress
+
+    def start(self, turns: Optional[int] = None) -> bool:
+        """
+        Queue turns to be played, unless some are already queued or the game is over
+        :param turns: how many turns to run, or None to run until the game is over
+        :return: True if the turns were queued
+        """
+        if self.is_running or self.arena.is_game_over:
+            return False
+        job_id = self.queue.submit(self.arena.to_dict(), turns)
+        with self.lock:
+            self.error = None
+            self.job = self.queue.job(job_id)
+        return True
+
+    def stop(self) -> None:
+        """
+        Ask the worker to stop once the current turn has finished
+        """
+        if self.job is not None:
+            self.queue.cancel(self.job.id)
+
+
+Loop = Union[GameLoop, QueuedLoop]
+
+
+def loop_for(arena: Arena) -> Loop:
+    """
+    :param arena: a new or rehydrated arena
+    :return: a loop to run its turns, queueing them for worker processes if OUTSMART_JOBS is set
+    """
+    if JobQueue.is_configured():
+        queue = JobQueue.instance()
+        if feeds.is_enabled():
+            queue.relay(feeds.publish)
+        return QueuedLoop(arena, queue)
+    return GameLoop(arena)
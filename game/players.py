@@ -1,8 +1,12 @@
 from typing import List, Dict, Any, Self
 from interfaces.llms import LLM
+from interfaces.prices import cost
+from game.budgets import Budget
 from prompting.system import instructions
 from prompting.user import prompt
 from models.records import TurnRecord
+import time
+from util import tracing, metrics
 
 
 class Player:
@@ -21,6 +25,9 @@ class Player:
     is_dead: bool
     is_winner: bool
     series: List[int]
+    draft: str
+    is_thinking: bool
+    cost: float
 
     MAX_TOKENS = 600
 
@@ -41,6 +48,9 @@ class Player:
         self.records = []
         self.is_dead = False
         self.is_winner = False
+        self.draft = ""
+        self.is_thinking = False
+        self.cost = 0.0
 
     def __repr__(self) -> str:
         """
@@ -65,15 +75,51 @@ class Player:
             self.name, other_names, other_coins, self.coins, turn, self.records
         )
 
+    def add_to_draft(self, text: str) -> None:
+        """
+        Callback for each piece of the response as the LLM streams it
+        The UI reads the draft on its own schedule, so nothing here waits on rendering
+        :param text: the latest piece of the response
+        """
+        self.draft += text
+
     def make_move(self, turn: int) -> str:
         """
-        Carry out a turn by interfacing with my LLM
+        Carry out a turn by interfacing with my LLM, streaming the response into the draft as it arrives
         :param turn: which turn number we are on
         :return: the response from the LLM
         """
-        system_prompt = self.system_prompt()
-        user_prompt = self.user_prompt(turn)
-        return self.llm.send(system_prompt, user_prompt, self.MAX_TOKENS)
+        with tracing.span("player.prompt", player=self.name, model=self.llm.model_name):
+            system_prompt = self.system_prompt()
+            user_prompt = self.user_prompt(turn)
+        self.draft = ""
+        self.is_thinking = True
+        model = self.llm.model_name
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with tracing.span("llm.send", player=self.name, model=model):
+                response = self.llm.send_stream(system_prompt, user_prompt, self.MAX_TOKENS, self.add_to_draft)
+            outcome = "ok"
+            return response
+        finally:
+            self.is_thinking = False
+            metrics.LLM_SECONDS.observe(time.perf_counter() - start, model=model, outcome=outcome)
+            if outcome == "ok" and self.llm.last_usage:
+                self.record_usage(self.llm.last_usage)
+
+    def record_usage(self, usage: Dict[str, int]) -> None:
+        """
+        Account for the tokens and the cost of the call just made
+        :param usage: the input and output tokens reported for the call
+        """
+        model = self.llm.model_name
+        dollars = cost(model, usage)
+        self.cost += dollars
+        Budget.instance().record_call(model, dollars)
+        metrics.COST.inc(dollars, model=model)
+        for kind, tokens in usage.items():
+            metrics.TOKENS.inc(tokens, model=model, kind=kind)
 
     def report(self) -> str:
         """
@@ -82,12 +128,55 @@ class Player:
         """
         result = f"Player name: {self.name}<br/>"
         result += f"Model: {self.llm.model_name}<br/>"
-        result += f"Temperature: {self.llm.temperature}<br/><br/>"
+        result += f"Temperature: {self.llm.temperature}<br/>"
+        result += f"Cost so far: ${self.cost:.4f}<br/><br/>"
         for turn_record in self.records:
             result += str(turn_record).replace("\n", "<br/>")
             result += "<br/>"
         return result
 
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: a plain dictionary of this Player's state, suitable for storing as JSON
+        """
+        return {
+            "name": self.name,
+            "model_name": self.llm.model_name,
+            "temperature": self.llm.temperature,
+            "coins": self.coins,
+            "prior_coins": self.prior_coins,
+            "series": self.series,
+            "is_dead": self.is_dead,
+            "is_winner": self.is_winner,
+            "cost": self.cost,
+            "others": [other.name for other in self.others],
+            "records": [record.to_dict() for record in self.records],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> Self:
+        """
+        Recreate a Player from its state, with a new client for its LLM; the others are linked up by the Arena
+        :param d: a dictionary created by to_dict
+        :return: the Player it represents
+        """
+        player = cls(d["name"], d["model_name"], d["temperature"])
+        player.load_state(d)
+        return player
+
+    def load_state(self, d: Dict[str, Any]) -> None:
+        """
+        Bring this Player up to date with its state, keeping its LLM client
+        :param d: a dictionary created by to_dict
+        """
+        self.coins = d["coins"]
+        self.prior_coins = d["prior_coins"]
+        self.series = d["series"]
+        self.is_dead = d["is_dead"]
+        self.is_winner = d["is_winner"]
+        self.cost = d["cost"]
+        self.records = [TurnRecord.from_dict(record) for record in d["records"]]
+
     def kill(self) -> None:
         """
         This player has died - update the status
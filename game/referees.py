@@ -5,6 +5,7 @@ from game.players import Player
 from models.moves import Move
 from models.records import TurnRecord
 from concurrent.futures import ThreadPoolExecutor
+from util import tracing, profiling, metrics
 
 logger = logging.getLogger(__name__)
 
@@ -42,13 +43,16 @@ class Referee:
         response = ""
         try:
             response = player.make_move(self.turn)
-            move = self.parse_response(response)
+            with tracing.span("referee.parse_response", player=player.name, model=player.llm.model_name):
+                move = self.parse_response(response)
             logger.info(f"Turn {self.turn} received OK from {player}")
+            metrics.MOVES.inc(model=player.llm.model_name, valid="true")
             return TurnRecord(player.name, self.turn, move=move)
         except Exception as e:
             logger.error(f"Exception while processing response from {player}")
             logger.error(e)
             logger.error(f"Response received was:\n{response}")
+            metrics.MOVES.inc(model=player.llm.model_name, valid="false")
             return TurnRecord(player.name, self.turn, is_invalid_move=True)
 
     def player_with_name(self, name: str) -> Player:
@@ -74,7 +78,8 @@ class Referee:
         progress(0, "Players are thinking..")
         responded = []
         with ThreadPoolExecutor(max_workers=len(self.players)) as e:
-            for record in e.map(self.do_turn_for_player, self.players):
+            do_turn_for_player = profiling.propagate(tracing.propagate(self.do_turn_for_player))
+            for record in e.map(do_turn_for_player, self.players):
                 player = self.player_with_name(record.name)
                 responded.append(record.name)
                 prog = len(responded) / len(self.players)
@@ -88,10 +93,15 @@ class Referee:
         """
         The turn has happened; now go through each player and make the trades
         """
-        self.handle_giving()
-        self.handle_taking()
-        self.handle_alliances()
-        self.handle_messages()
+        with tracing.span("referee.handle_turn"):
+            with tracing.span("referee.handle_giving"):
+                self.handle_giving()
+            with tracing.span("referee.handle_taking"):
+                self.handle_taking()
+            with tracing.span("referee.handle_alliances"):
+                self.handle_alliances()
+            with tracing.span("referee.handle_messages"):
+                self.handle_messages()
 
     def handle_giving(self) -> None:
         """
@@ -160,6 +170,8 @@ class Referee:
         self.records[name1].alliances_with.append(name2)
         self.records[name2].alliances_with.append(name1)
         self.records[victim].alliances_against.extend([name1, name2])
+        for name in [name1, name2]:
+            metrics.ALLIANCES.inc(model=self.player_map[name].llm.model_name)
 
     def handle_messages(self) -> None:
         """
@@ -0,0 +1,108 @@
+"""
+Run games headlessly, without the Streamlit UI, for tournaments and bot-driven runs
+Games are recorded as usual if a database is configured, and a summary of each game is printed.
+
+Run with:
+python -m game.runner --games 10
+python -m game.runner --games 5 --models gpt-5-nano claude-haiku-4-5 grok-4-fast openai/gpt-oss-120b
+python -m game.runner --games 3 --profile profiles --top 40
+python -m game.runner --games 1000 --metrics-port 9100
+python -m game.runner --games 100 --budget 5
+python -m game.runner --games 10 --feed-port 8800
+"""
+
+import time
+import logging
+import argparse
+from typing import List, Optional
+from dotenv import load_dotenv
+from game.arenas import Arena
+from game.players import Player
+from game.budgets import Budget, BudgetExhausted
+from models.writer import GameWriter
+from models.stores import Store
+from util import profiling, metrics, feeds
+from util.setup import setup_logger
+
+
+def new_arena(models: Optional[List[str]]) -> Arena:
+    """
+    :param models: the models to play, or None for the same choice as the app
+    :return: a new Arena
+    """
+    if not models:
+        return Arena.default()
+    players = [Player(name, model, Arena.TEMPERATURE) for name, model in zip(Arena.NAMES, models)]
+    return Arena(players)
+
+
+def play(arena: Arena) -> float:
+    """
+    Run the arena's game to the end
+    :return: the elapsed seconds
+    """
+    start = time.perf_counter()
+    while not arena.is_game_over:
+        arena.do_turn(lambda fraction, text: None)
+    return time.perf_counter() - start
+
+
+def summary(arena: Arena, seconds: float) -> str:
+    """
+    :return: a line describing the outcome of a finished game
+    """
+    players = sorted(arena.players, key=lambda player: -player.coins)
+    scores = ", ".join(f"{player.llm.model_name} {player.coins}" for player in players)
+    return f"Game {arena.game_id} ended on turn {arena.turn} after {seconds:.1f}s costing ${arena.cost():.4f}: {scores}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Outsmart games without the UI")
+    parser.add_argument("--games", type=int, default=1, help="how many games to play")
+    parser.add_argument("--models", nargs="+", help="the models to play, 1 per player")
+    parser.add_argument("--profile", metavar="DIR", help="profile every turn, writing .prof files and reports to DIR")
+    parser.add_argument("--top", type=int, default=profiling.TOP, help="how many functions to list in profile reports")
+    parser.add_argument("--budget", type=float, help="stop, or use cheaper line-ups, as the spend nears this many dollars")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics at http://localhost:PORT/metrics")
+    parser.add_argument("--feed-port", type=int, help="serve spectator feeds at http://localhost:PORT/games")
+    args = parser.parse_args()
+
+    setup_logger(logging.getLogger())
+    load_dotenv(override=True)
+    if args.profile:
+        profiling.enable(args.profile, args.top)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    if args.feed_port:
+        feeds.enable(args.feed_port)
+
+    budget = Budget.instance()
+    if args.budget:
+        budget.ceiling = args.budget
+    total = 0.0
+    played = 0
+    for _ in range(args.games):
+        if budget.is_exhausted() or (args.models and not budget.affords(args.models)):
+            print(f"Stopping, as the spend of ${budget.spent:.2f} is near the budget of ${budget.ceiling:.2f}")
+            break
+        try:
+            arena = new_arena(args.models)
+        except BudgetExhausted as e:
+            print(f"Stopping: {e}")
+            break
+        if args.feed_port:
+            print(f"Watch at {arena.spectate()}")
+        seconds = play(arena)
+        total += arena.cost()
+        played += 1
+        print(summary(arena, seconds))
+        if profiling.profiler():
+            print(f"Profile written to {profiling.profiler().path(arena.game_id, 'report.txt')}")
+
+    print(f"Played {played} games for ${total:.4f}")
+    if Store.is_configured() and not GameWriter.instance().flush():
+        print("Some games are still being saved; they will be replayed from the journal next time")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+The arenas of every browser session, held within a budget of memory and of count for the whole process
+Rather than keeping its Arena in st.session_state, each session keeps only a key, and asks the SessionStore for
+its GameLoop on every rerun. When the budget is exceeded, finished games are evicted first, then the least
+recently used; any arena left idle for IDLE_SECONDS is evicted regardless. An evicted arena is written to a small
+gzipped JSON file, and rehydrated with new LLM clients the next time its session asks for it.
+An arena is never evicted while its turns are running.
+
+Configure with OUTSMART_MAX_ARENAS (50 by default), OUTSMART_ARENA_MEMORY in MB (500 by default), and
+OUTSMART_SESSIONS, the directory for evicted arenas (outsmart_sessions by default).
+Memory is estimated by walking the objects that each arena references, so it's approximate.
+"""
+
+import gc
+import os
+import sys
+import json
+import gzip
+import time
+import types
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Self
+from game.arenas import Arena
+from game.loops import Loop, loop_for
+from util import metrics
+
+logger = logging.getLogger(__name__)
+
+# Objects of these types are shared across the process, so they aren't counted and aren't followed
+SHARED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, logging.Logger, logging.Manager)
+
+
+def footprint(root: Any) -> int:
+    """
+    Estimate the memory held by an object and everything that it references
+    :param root: the object, such as an Arena
+    :return: an estimate in bytes
+    """
+    seen = set()
+    total = 0
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return total
+
+
+class Entry:
+    """
+    The GameLoop of 1 session that's held in memory
+    """
+
+    loop: Loop
+    last_access: float
+    size: int
+
+    def __init__(self, loop: Loop):
+        self.loop = loop
+        self.touch()
+
+    def touch(self) -> None:
+        """
+        Record an access, and estimate the memory again as the arena may have moved on since the last one
+        """
+        self.last_access = time.monotonic()
+        self.size = footprint(self.loop.arena)
+
+
+class SessionStore:
+    """
+    Holds the GameLoop of each session, evicting arenas to disk to stay within the budget
+    Use SessionStore.instance() to get the 1 store for this process
+    """
+
+    max_arenas: int
+    max_bytes: int
+    directory: str
+    entries: "OrderedDict[str, Entry]"
+
+    IDLE_SECONDS = 15 * 60
+    EXPIRE_SECONDS = 24 * 60 * 60
+    SWEEP_SECONDS = 60
+    DEFAULT_DIRECTORY = "outsmart_sessions"
+
+    _instance: Optional[Self] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_arenas: int, max_bytes: int, directory: str):
+        """
+        :param max_arenas: the most arenas to hold in memory
+        :param max_bytes: the most memory for the arenas held, as estimated
+        :param directory: where to write evicted arenas
+        """
+        self.max_arenas = max_arenas
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_sweep = time.monotonic()
+        self.evictions = 0
+        self.rehydrations = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def instance(cls) -> Self:
+        """
+        :return: the store for this process, creating it on first use
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                max_arenas = int(os.getenv("OUTSMART_MAX_ARENAS", "50"))
+                max_bytes = int(float(os.getenv("OUTSMART_ARENA_MEMORY", "500")) * 1e6)
+                directory = os.getenv("OUTSMART_SESSIONS", cls.DEFAULT_DIRECTORY)
+                cls._instance = cls(max_arenas, max_bytes, directory)
+            return cls._instance
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, key: str) -> Loop:
+        """
+        Find the GameLoop of a session, rehydrating its arena from disk or starting a new game as needed
+        :param key: identifies the session
+        :return: the session's GameLoop
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+                entry.touch()
+            else:
+                entry = Entry(loop_for(self.load(key) or Arena.default()))
+                self.entries[key] = entry
+            self.evict(key)
+            self.publish()
+            return entry.loop
+
+    def discard(self, key: str) -> None:
+        """
+        Throw away the game of a session, so that it starts a new one on its next rerun
+        :param key: identifies the session
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry:
+                entry.loop.stop()
+            if os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+            self.publish()
+
+    def load(self, key: str) -> Optional[Arena]:
+        """
+        :param key: identifies the session
+        :return: the session's arena from disk, or None if it has none that can be read
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                arena = Arena.from_dict(json.load(f))
+        except Exception as e:
+            logger.error(f"Failed to rehydrate the arena of session {key}")
+            logger.error(e)
+            return None
+        finally:
+            os.remove(path)
+        self.rehydrations += 1
+        metrics.REHYDRATIONS.inc()
+        return arena
+
+    def offload(self, key: str, reason: str) -> None:
+        """
+        Write the arena of a session to disk and drop it from memory
+        :param key: identifies the session
+        :param reason: why it's being evicted, for the metrics
+        """
+        entry = self.entries.pop(key)
+        path = self.path(key)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(entry.loop.arena.to_dict(), f)
+        os.replace(path + ".tmp", path)
+        self.evictions += 1
+        metrics.EVICTIONS.inc(reason=reason)
+        metrics.SESSION_BYTES.observe(entry.size)
+        logger.info(f"Evicted the arena of session {key} ({reason}, about {entry.size / 1e6:.1f} MB)")
+
+    def candidates(self, current: str) -> List[str]:
+        """
+        :param current: the session being served, which is never evicted
+        :return: the sessions that could be evicted, finished games first, then least recently used first
+        """
+        keys = [key for key, entry in self.entries.items() if key != current and not entry.loop.is_running]
+        return sorted(keys, key=lambda key: not self.entries[key].loop.arena.is_game_over)
+
+    def memory(self) -> int:
+        return sum(entry.size for entry in self.entries.values())
+
+    def evict(self, current: str) -> None:
+        """
+        Evict idle arenas, then more until the arenas in memory are within the budget
+        :param current: the session being served, which is never evicted
+        """
+        now = time.monotonic()
+        for key in self.candidates(current):
+            if now - self.entries[key].last_access > self.IDLE_SECONDS:
+                self.offload(key, "idle")
+        for key in self.candidates(current):
+            if len(self.entries) <= self.max_arenas and self.memory() <= self.max_bytes:
+                break
+            self.offload(key, "budget")
+        if now - self.last_sweep > self.SWEEP_SECONDS:
+            self.last_sweep = now
+            self.expire()
+
+    def expire(self) -> None:
+        """
+        Delete evicted arenas whose sessions haven't come back for EXPIRE_SECONDS, as they're unlikely to
+        """
+        cutoff = time.time() - self.EXPIRE_SECONDS
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: how many arenas are held in memory and on disk, the memory of each session in memory,
+        and how many arenas have been evicted and rehydrated
+        """
+        with self.lock:
+            sizes = {key: entry.size for key, entry in self.entries.items()}
+        return {
+            "in_memory": len(sizes),
+            "on_disk": self.on_disk(),
+            "memory": sum(sizes.values()),
+            "sizes": sizes,
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations,
+        }
+
+    def on_disk(self) -> int:
+        return len([name for name in os.listdir(self.directory) if name.endswith(".json.gz")])
+
+    def publish(self) -> None:
+        """
+        Update the gauges of the sessions held
+        """
+        metrics.SESSIONS.set(len(self.entries), where="memory")
+        metrics.SESSIONS.set(self.on_disk(), where="disk")
+        metrics.SESSION_MEMORY.set(self.memory())
@@ -0,0 +1,180 @@
+"""
+Worker processes that play the games queued by the app, so that LLM calls never run in the web server
+Each process claims 1 job at a time from the JobQueue, rehydrates its arena, and plays the turns, writing the arena
+back after every turn and its progress and drafts every HEARTBEAT_SECONDS while a turn is being played.
+Run more processes for more games at once. They must run on the same host as the app and the SQLite file, as the
+queue uses SQLite's WAL mode, which doesn't work over a network filesystem.
+
+Run with:
+OUTSMART_JOBS=outsmart_jobs.db python -m game.workers --processes 4
+
+The spectator events of the games are passed back through the queue, for the app to serve if OUTSMART_FEED_PORT is
+set there.
+"""
+
+import os
+import time
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from game.arenas import Arena
+from game.jobs import Job, JobQueue, DONE, FAILED, CANCELLED
+from models.writer import GameWriter
+from models.stores import Store
+from util import feeds
+from util.setup import setup_logger
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 0.5
+POLL_SECONDS = 0.5
+PURGE_SECONDS = 10 * 60
+
+
+class JobRunner:
+    """
+    Plays the turns of 1 job, reporting its progress from a heartbeat thread
+    """
+
+    queue: JobQueue
+    job: Job
+    worker: str
+    arena: Optional[Arena]
+
+    def __init__(self, queue: JobQueue, job: Job, worker: str):
+        """
+        :param queue: the queue that the job was claimed from
+        :param job: the job
+        :param worker: the name that the job was claimed with
+        """
+        self.queue = queue
+        self.job = job
+        self.worker = worker
+        self.arena = None
+        self.fraction = 0.0
+        self.status = ""
+        self.cancelled = job.cancel
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def report(self, fraction: float, status: str) -> None:
+        """
+        The progress callback passed to the Arena; it's called from the referee's threads
+        """
+        with self.lock:
+            self.fraction = fraction
+            self.status = status
+
+    def drafts(self) -> Dict[str, str]:
+        """
+        :return: the response streaming in so far for each player that's still thinking
+        """
+        if self.arena is None:
+            return {}
+        return {player.name: player.draft for player in self.arena.players if player.is_thinking}
+
+    def beat(self) -> None:
+        """
+        The body of the heartbeat thread, which carries on through errors such as a locked database, so that the job
+        isn't taken for stale while its turns are still being played
+        """
+        while not self.done.wait(HEARTBEAT_SECONDS):
+            with self.lock:
+                fraction, status = self.fraction, self.status
+            try:
+                if self.queue.report(self.job.id, self.worker, fraction, status, self.drafts()):
+                    self.cancelled = True
+            except Exception:
+                logger.exception(f"Job {self.job.id}: failed to report progress")
+
+    def run(self) -> None:
+        heartbeat = threading.Thread(target=self.beat, name=f"heartbeat-{self.job.id}", daemon=True)
+        heartbeat.start()
+        remaining = self.job.turns
+        try:
+            self.arena = Arena.from_dict(self.queue.state(self.job.id))
+            while not self.arena.is_game_over and not self.cancelled and remaining != 0:
+                logger.info(f"Job {self.job.id}: kicking off turn {self.arena.turn}")
+                self.report(0.0, "Kicking off turn")
+                self.arena.do_turn(self.report)
+                if not self.queue.save_state(self.job.id, self.worker, self.arena.to_dict()):
+                    logger.warning(f"Job {self.job.id} has been handed to another worker; stopping")
+                    return
+                if remaining is not None:
+                    remaining -= 1
+            if not self.queue.finish(self.job.id, self.worker, CANCELLED if self.cancelled else DONE):
+                logger.warning(f"Job {self.job.id} has been handed to another worker")
+        except Exception as e:
+            logger.error(f"Job {self.job.id} failed")
+            logger.error(e)
+            self.queue.finish(self.job.id, self.worker, FAILED, str(e))
+        finally:
+            self.done.set()
+            heartbeat.join()
+
+
+def work(path: str, poll: float = POLL_SECONDS) -> None:
+    """
+    The body of a worker process: claim jobs and run them, forever, purging old jobs and events every PURGE_SECONDS
+    :param path: the SQLite file of the JobQueue
+    :param poll: how long to wait before looking again when there are no jobs
+    """
+    load_dotenv(override=True)
+    setup_logger(logging.getLogger())
+    queue = JobQueue(path)
+    feeds.forward(queue.publish)
+    name = f"{socket.gethostname()}-{os.getpid()}"
+    logger.info(f"Worker {name} is waiting for jobs")
+    purged = time.monotonic() - PURGE_SECONDS
+    while True:
+        try:
+            if time.monotonic() - purged >= PURGE_SECONDS:
+                queue.purge()
+                purged = time.monotonic()
+            job = queue.claim(name)
+            if job is None:
+                time.sleep(poll)
+                continue
+            JobRunner(queue, job, name).run()
+            if Store.is_configured():
+                GameWriter.instance().flush()
+        except Exception:
+            logger.exception(f"Worker {name} failed; carrying on with the next job")
+            time.sleep(poll)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="how many worker processes")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between looks at an empty queue")
+    args = parser.parse_args()
+    load_dotenv(override=True)
+    setup_logger(logging.getLogger())
+    path = os.getenv("OUTSMART_JOBS")
+    if not path:
+        parser.error("set OUTSMART_JOBS to the path of the job queue's SQLite file")
+    processes = [
+        multiprocessing.Process(
+            target=work,
+            args=(path, args.poll),
+            name=f"worker-{index}",
+            daemon=True,
+        )
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {len(processes)} workers on {path}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,19 @@ This module contains the interfaces to external LLMs;
 There's an abstract base class LLM that can be subclassed to provide an interface to a model.
 The class method LLM.for_model_name creates an instance of a subclass to interact with the API
 This module should have no knowledge of the game itself.
+Each LLM can also stream its response with send_stream(), passing each piece of text to a callback as it arrives.
+After each call, last_usage holds the number of input and output tokens, where the API reports them.
+Each provider's SDK is imported in setup_client, so it's only loaded once a model of that provider is created.
 """
 
 import os
 from abc import ABC
-from typing import Any, Dict, Self, List, Type
-from openai import OpenAI
-import anthropic
-from groq import Groq
+from typing import Any, Callable, Dict, Iterable, Optional, Self, List, Type
 
 
+# To point a client elsewhere, such as at the mock server in interfaces.mockserver, set an environment variable of
+# the same name. It's read when each client is set up, after .env has been loaded: by the Grok and Gemini clients
+# here, and by the OpenAI, Anthropic and Groq SDKs themselves for OPENAI_BASE_URL, ANTHROPIC_BASE_URL and GROQ_BASE_URL
 ANTHROPIC_BASE_URL = "https://api.anthropic.com/v1/"
 DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
@@ -21,6 +24,8 @@ GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OLLAMA_BASE_URL = "http://localhost:11434/v1"
 
+TokenCallback = Callable[[str], None]
+
 
 class LLM(ABC):
     """
@@ -32,10 +37,12 @@ class LLM(ABC):
     model_name: str
     temperature: float
     client: Any
+    last_usage: Optional[Dict[str, int]]
 
     def __init__(self, model_name, temperature=1.0):
         self.model_name = model_name
         self.temperature = temperature
+        self.last_usage = None
         self.setup_client()
 
     def setup_client(self):
@@ -54,6 +61,51 @@ class LLM(ABC):
         """
         pass
 
+    def send_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, on_token: TokenCallback) -> str:
+        """
+        Overridden by subclasses whose API can stream; by default, send the whole response to the callback at once
+        :param system_prompt: The system prompt passed to the LLM
+        :param user_prompt: The user prompt passed to the LLM
+        :param max_tokens: Maximum number of tokens
+        :param on_token: called with each piece of the response as it arrives
+        :return: the full response from the LLM
+        """
+        response = self.send(system_prompt, user_prompt, max_tokens)
+        on_token(response)
+        return response
+
+    def record_usage(self, usage: Any) -> None:
+        """
+        Keep the token counts reported for the last call, in either the OpenAI or the Anthropic style
+        :param usage: the usage object from the API response, or None if it wasn't reported
+        """
+        if usage is None:
+            self.last_usage = None
+        elif hasattr(usage, "input_tokens"):
+            self.last_usage = {"input": usage.input_tokens, "output": usage.output_tokens}
+        else:
+            self.last_usage = {"input": usage.prompt_tokens, "output": usage.completion_tokens}
+
+    def collect(self, chunks: Iterable[Any], on_token: TokenCallback) -> str:
+        """
+        Read a streamed chat completion from an OpenAI compatible API
+        The usage arrives on the final chunk, or in x_groq for Groq
+        :param chunks: the stream of chunks
+        :param on_token: called with the text of each chunk
+        :return: the full response
+        """
+        pieces = []
+        usage = None
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                text = chunk.choices[0].delta.content
+                pieces.append(text)
+                on_token(text)
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = chunk.usage or (x_groq and x_groq.usage) or usage
+        self.record_usage(usage)
+        return "".join(pieces)
+
     def __repr__(self) -> str:
         """
         :return: A string version of the receiver
@@ -101,6 +153,8 @@ class GPT(LLM):
     ]
 
     def setup_client(self):
+        from openai import OpenAI
+
         self.client = OpenAI()
 
     def send(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
@@ -121,8 +175,27 @@ class GPT(LLM):
             response_format={"type": "json_object"},
             reasoning_effort=effort,
         )
+        self.record_usage(completion.usage)
         return completion.choices[0].message.content
 
+    def send_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, on_token: TokenCallback) -> str:
+        """
+        Streaming implementation for OpenAI / GPT
+        """
+        effort = "low" if "gpt-5" in self.model_name else None
+        chunks = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            response_format={"type": "json_object"},
+            reasoning_effort=effort,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        return self.collect(chunks, on_token)
+
 
 class Claude(LLM):
     model_names = [
@@ -131,6 +204,8 @@ class Claude(LLM):
     ]
 
     def setup_client(self):
+        import anthropic
+
         self.client = anthropic.Anthropic()
 
     def send(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
@@ -150,8 +225,29 @@ class Claude(LLM):
                 {"role": "user", "content": user_prompt},
             ],
         )
+        self.record_usage(message.usage)
         return message.content[0].text
 
+    def send_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, on_token: TokenCallback) -> str:
+        """
+        Streaming implementation for Anthropic / Claude
+        """
+        pieces = []
+        with self.client.messages.stream(
+            model=self.model_name,
+            max_tokens=max_tokens,
+            temperature=0.5,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": user_prompt},
+            ],
+        ) as stream:
+            for text in stream.text_stream:
+                pieces.append(text)
+                on_token(text)
+            self.record_usage(stream.get_final_message().usage)
+        return "".join(pieces)
+
 
 # class Gemini(LLM):
 #     model_names = ["gemini-1.0-pro", "gemini-1.5-flash", "gemini-2.0-flash", "gemini-2.5-flash"]
@@ -186,7 +282,9 @@ class Grok(LLM):
     model_names = ["grok-4", "grok-4-fast"]
 
     def setup_client(self):
-        self.client = OpenAI(api_key=os.getenv("GROK_API_KEY"), base_url=GROK_BASE_URL)
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=os.getenv("GROK_API_KEY"), base_url=os.getenv("GROK_BASE_URL", GROK_BASE_URL))
 
     def send(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
         """
@@ -203,8 +301,24 @@ class Grok(LLM):
                 {"role": "user", "content": user_prompt},
             ],
         )
+        self.record_usage(completion.usage)
         return completion.choices[0].message.content
 
+    def send_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, on_token: TokenCallback) -> str:
+        """
+        Streaming implementation for Grok
+        """
+        chunks = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        return self.collect(chunks, on_token)
+
 
 class Gemini(LLM):
     model_names = [
@@ -213,7 +327,10 @@ class Gemini(LLM):
     ]
 
     def setup_client(self):
-        self.client = OpenAI(api_key=os.getenv("GOOGLE_API_KEY"), base_url=GEMINI_BASE_URL)
+        from openai import OpenAI
+
+        base_url = os.getenv("GEMINI_BASE_URL", GEMINI_BASE_URL)
+        self.client = OpenAI(api_key=os.getenv("GOOGLE_API_KEY"), base_url=base_url)
 
     def send(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
         """
@@ -232,8 +349,26 @@ class Gemini(LLM):
             temperature=0.5,
             response_format={"type": "json_object"},
         )
+        self.record_usage(completion.usage)
         return completion.choices[0].message.content
 
+    def send_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, on_token: TokenCallback) -> str:
+        """
+        Streaming implementation for Gemini
+        """
+        chunks = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0.5,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        return self.collect(chunks, on_token)
+
 
 class GroqAPI(LLM):
     """
@@ -245,6 +380,8 @@ class GroqAPI(LLM):
     ]
 
     def setup_client(self):
+        from groq import Groq
+
         self.client = Groq()
 
     def send(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
@@ -264,4 +401,21 @@ class GroqAPI(LLM):
             temperature=0.5,
             response_format={"type": "json_object"},
         )
+        self.record_usage(completion.usage)
         return completion.choices[0].message.content
+
+    def send_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, on_token: TokenCallback) -> str:
+        """
+        Streaming implementation for Groq
+        """
+        chunks = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0.5,
+            response_format={"type": "json_object"},
+            stream=True,
+        )
+        return self.collect(chunks, on_token)
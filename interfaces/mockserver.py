@@ -0,0 +1,371 @@
+"""
+A local mock of the OpenAI chat completions and Anthropic messages APIs, for load testing without spending money
+The real SDK clients talk to it over HTTP, so connection pools, concurrency, retries and timeouts are all exercised.
+Each reply is a valid move for the player named in the prompt, chosen by a pluggable strategy, and arrives after a
+latency drawn from a log-normal distribution with the given p50 and p99, plus jitter. A fraction of requests can
+fail with a 500, or with a 429 and a Retry-After header, to see how the arena copes with a degraded provider.
+
+Run with:
+python -m interfaces.mockserver --port 8700 --p50 2 --p99 10 --error-rate 0.01 --rate-limit-rate 0.02
+
+Then point the clients at it, with the environment variables that it prints out on startup:
+OPENAI_BASE_URL, ANTHROPIC_BASE_URL, GROQ_BASE_URL, GROK_BASE_URL and GEMINI_BASE_URL
+"""
+
+import re
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+Strategy = Callable[[str, Dict[str, int], random.Random], Tuple[str, str]]
+
+NAME_PATTERN = re.compile(r"Your player name is (\w+) and the other players are ([\w, ]+)\.")
+COINS_PATTERN = re.compile(r"- (\w+) has (\d+) coins")
+CHUNK_CHARACTERS = 12
+
+
+def random_strategy(name: str, others: Dict[str, int], rng: random.Random) -> Tuple[str, str]:
+    """
+    Give to 1 random player and take from another, or give to and take from the same player if there's only 1
+    """
+    if len(others) == 1:
+        return next(iter(others)), next(iter(others))
+    return tuple(rng.sample(list(others), 2))
+
+
+def greedy_strategy(name: str, others: Dict[str, int], rng: random.Random) -> Tuple[str, str]:
+    """
+    Give to the poorest player and take from the richest
+    """
+    ranked = sorted(others, key=lambda other: (others[other], rng.random()))
+    return ranked[0], ranked[-1]
+
+
+def loyal_strategy(name: str, others: Dict[str, int], rng: random.Random) -> Tuple[str, str]:
+    """
+    Always give to the same partner, and take from the richest of the rest, so that alliances form
+    """
+    ordered = sorted(others)
+    partner = ordered[0] if name > ordered[0] else ordered[-1]
+    victims = [other for other in ordered if other != partner] or [partner]
+    return partner, max(victims, key=lambda other: others[other])
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    "random": random_strategy,
+    "greedy": greedy_strategy,
+    "loyal": loyal_strategy,
+}
+
+
+class Behaviour:
+    """
+    How the mock server responds: its strategy, latency and failures
+    """
+
+    strategy: Strategy
+    p50: float
+    p99: float
+    jitter: float
+    error_rate: float
+    rate_limit_rate: float
+    ttft_fraction: float
+
+    def __init__(
+        self,
+        strategy: str = "random",
+        p50: float = 1.0,
+        p99: float = 5.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        ttft_fraction: float = 0.3,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param strategy: the name of a strategy in STRATEGIES
+        :param p50: the median latency of a response, in seconds
+        :param p99: the 99th percentile latency, in seconds
+        :param jitter: a uniform random amount of up to this many seconds added to every latency
+        :param error_rate: the fraction of requests that fail with a 500
+        :param rate_limit_rate: the fraction of requests that fail with a 429
+        :param ttft_fraction: when streaming, the fraction of the latency before the first token
+        :param seed: a random seed, so that runs can be reproduced
+        """
+        self.strategy = STRATEGIES[strategy]
+        self.p50 = p50
+        self.p99 = max(p99, p50)
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.ttft_fraction = ttft_fraction
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def latency(self) -> float:
+        """
+        :return: seconds to take over a response, log-normal with the configured p50 and p99, plus jitter
+        """
+        sigma = (math.log(self.p99) - math.log(self.p50)) / 2.326 if self.p50 > 0 else 0.0
+        with self.lock:
+            base = self.p50 * math.exp(self.rng.gauss(0, sigma)) if self.p50 > 0 else 0.0
+            return base + self.rng.uniform(0, self.jitter)
+
+    def failure(self) -> Optional[int]:
+        """
+        :return: an HTTP status to fail this request with, or None to succeed
+        """
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def move(self, prompt: str) -> str:
+        """
+        :param prompt: the user prompt sent by a player
+        :return: the JSON of a move for that player
+        """
+        match = NAME_PATTERN.search(prompt)
+        if not match:
+            return json.dumps({"error": "This mock only plays Outsmart"})
+        name = match.group(1)
+        others = {other.strip(): 12 for other in match.group(2).split(",")}
+        others |= {other: int(coins) for other, coins in COINS_PATTERN.findall(prompt) if other in others}
+        with self.lock:
+            give, take = self.strategy(name, others, self.rng)
+        move = {
+            "secret strategy": f"Give to {give} to build trust, and take from {take} while they're distracted.",
+            "give coin to": give,
+            "take coin from": take,
+            "private messages": {
+                other: f"{other}, let's give each other a coin and both take from {take}." for other in others
+            },
+        }
+        return json.dumps(move)
+
+
+def usage(prompt: str, response: str) -> Tuple[int, int]:
+    """
+    :return: rough input and output token counts, at 4 characters per token
+    """
+    return len(prompt) // 4, len(response) // 4
+
+
+def pieces(text: str) -> List[str]:
+    return [text[i : i + CHUNK_CHARACTERS] for i in range(0, len(text), CHUNK_CHARACTERS)]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """
+    Handles chat completions at any path ending /chat/completions, and Anthropic messages at /v1/messages
+    """
+
+    behaviour: Behaviour
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        status = self.behaviour.failure()
+        if status:
+            self.fail(status)
+            return
+        prompt = "\n".join(
+            message["content"] if isinstance(message["content"], str) else json.dumps(message["content"])
+            for message in body.get("messages", [])
+            if message.get("role") == "user"
+        )
+        response = self.behaviour.move(prompt)
+        latency = self.behaviour.latency()
+        path = self.path.split("?")[0]
+        if path.endswith("/chat/completions"):
+            self.chat_completion(body, prompt, response, latency)
+        elif path.endswith("/messages"):
+            self.anthropic_message(body, prompt, response, latency)
+        else:
+            self.send_error(404)
+
+    def fail(self, status: int) -> None:
+        kind = "rate_limit_error" if status == 429 else "api_error"
+        data = json.dumps({"error": {"type": kind, "message": "Injected by the mock"}}).encode("utf-8")
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, payload: Dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start_stream(self) -> None:
+        """
+        Start a stream of server-sent events in chunked encoding, so that the connection can be kept alive for the
+        next request, as it would be by a real provider
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def send_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def end_stream(self) -> None:
+        self.send_chunk(b"")
+
+    def send_event(self, payload: Dict, event: Optional[str] = None) -> None:
+        text = f"event: {event}\n" if event else ""
+        text += f"data: {json.dumps(payload)}\n\n"
+        self.send_chunk(text.encode("utf-8"))
+
+    def stream(self, chunks: List[str], latency: float, send: Callable[[str], None]) -> None:
+        """
+        Send the chunks of a response, with the first after part of the latency and the rest spread over the remainder
+        """
+        time.sleep(latency * self.behaviour.ttft_fraction)
+        gap = latency * (1 - self.behaviour.ttft_fraction) / max(len(chunks), 1)
+        for chunk in chunks:
+            send(chunk)
+            time.sleep(gap)
+
+    def chat_completion(self, body: Dict, prompt: str, response: str, latency: float) -> None:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "mock")
+        input_tokens, output_tokens = usage(prompt, response)
+        token_usage = {
+            "prompt_tokens": input_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        base = {"id": completion_id, "created": int(time.time()), "model": model}
+        if not body.get("stream"):
+            time.sleep(latency)
+            choice = {"index": 0, "message": {"role": "assistant", "content": response}, "finish_reason": "stop"}
+            self.send_json(base | {"object": "chat.completion", "choices": [choice], "usage": token_usage})
+            return
+        self.start_stream()
+        chunk = base | {"object": "chat.completion.chunk"}
+
+        def send(text: str) -> None:
+            self.send_event(chunk | {"choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]})
+
+        self.stream(pieces(response), latency, send)
+        self.send_event(chunk | {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if body.get("stream_options", {}).get("include_usage"):
+            self.send_event(chunk | {"choices": [], "usage": token_usage})
+        self.send_chunk(b"data: [DONE]\n\n")
+        self.end_stream()
+
+    def anthropic_message(self, body: Dict, prompt: str, response: str, latency: float) -> None:
+        message_id = f"msg_{uuid.uuid4().hex}"
+        input_tokens, output_tokens = usage(prompt, response)
+        message = {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "stop_reason": None,
+            "stop_sequence": None,
+        }
+        if not body.get("stream"):
+            time.sleep(latency)
+            content = [{"type": "text", "text": response}]
+            token_usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+            self.send_json(message | {"content": content, "stop_reason": "end_turn", "usage": token_usage})
+            return
+        self.start_stream()
+        start = message | {"content": [], "usage": {"input_tokens": input_tokens, "output_tokens": 0}}
+        self.send_event({"type": "message_start", "message": start}, "message_start")
+        block = {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+        self.send_event(block, "content_block_start")
+
+        def send(text: str) -> None:
+            delta = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}}
+            self.send_event(delta, "content_block_delta")
+
+        self.stream(pieces(response), latency, send)
+        self.send_event({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        delta = {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}}
+        self.send_event(delta | {"usage": {"output_tokens": output_tokens}}, "message_delta")
+        self.send_event({"type": "message_stop"}, "message_stop")
+        self.end_stream()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(behaviour: Behaviour, port: int = 8700, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Start the mock server on a background thread
+    :param behaviour: how it should respond
+    :param port: the port to listen on; 0 picks a free port
+    :param host: the interface to listen on
+    :return: the running server
+    """
+    handler = type("Handler", (MockHandler,), {"behaviour": behaviour})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server
+
+
+def environment(server: ThreadingHTTPServer) -> Dict[str, str]:
+    """
+    :param server: a running mock server
+    :return: the environment variables that point every provider's client at it
+    """
+    host, port = server.server_address[:2]
+    root = f"http://{host}:{port}"
+    return {
+        "OPENAI_BASE_URL": f"{root}/v1",
+        "ANTHROPIC_BASE_URL": root,
+        "GROQ_BASE_URL": root,
+        "GROK_BASE_URL": f"{root}/v1",
+        "GEMINI_BASE_URL": f"{root}/v1",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="A mock OpenAI and Anthropic API server that plays Outsmart")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), default="random")
+    parser.add_argument("--p50", type=float, default=1.0, help="median latency in seconds")
+    parser.add_argument("--p99", type=float, default=5.0, help="99th percentile latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many seconds added at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests that get a 429")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    behaviour = Behaviour(
+        args.strategy, args.p50, args.p99, args.jitter, args.error_rate, args.rate_limit_rate, seed=args.seed
+    )
+    server = serve(behaviour, args.port, args.host)
+    print("Mock LLM server running; point the clients at it with:")
+    for name, value in environment(server).items():
+        print(f"{name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
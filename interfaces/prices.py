@@ -0,0 +1,44 @@
+"""
+The price of each model, and the cost in dollars of a call given the tokens that the provider reported
+Prices are list prices in dollars per million tokens, for input and for output, and should be kept up to date
+as providers change them. Reasoning tokens are billed as output, and are included in the output counts reported.
+Models that aren't in the table cost nothing, which is right for local models served by Ollama.
+"""
+
+from typing import Dict, Optional, Tuple
+
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-5": (1.25, 10.00),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "claude-sonnet-4-5": (3.00, 15.00),
+    "claude-haiku-4-5": (1.00, 5.00),
+    "grok-4": (3.00, 15.00),
+    "grok-4-fast": (0.20, 0.50),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "openai/gpt-oss-120b": (0.15, 0.75),
+}
+
+# Used to estimate the cost of a call before it's made, until there are real calls to average
+TYPICAL_USAGE = {"input": 4_000, "output": 1_500}
+
+
+def cost(model_name: str, usage: Optional[Dict[str, int]]) -> float:
+    """
+    :param model_name: the model that was called
+    :param usage: the input and output tokens, as in LLM.last_usage
+    :return: the cost of the call in dollars
+    """
+    if not usage:
+        return 0.0
+    input_price, output_price = PRICES.get(model_name, (0.0, 0.0))
+    return (usage.get("input", 0) * input_price + usage.get("output", 0) * output_price) / 1e6
+
+
+def typical_cost(model_name: str) -> float:
+    """
+    :param model_name: a model
+    :return: an estimate in dollars of 1 call, from typical token counts
+    """
+    return cost(model_name, TYPICAL_USAGE)
@@ -0,0 +1,116 @@
+"""
+A process-wide cache for leaderboard data, keyed on the version of the stored data
+The store bumps its version whenever games are saved, so results are reused across every session until new
+games arrive, rather than expiring after a fixed time. Concurrent requests for the same missing value are
+coalesced, so only 1 of them does the work and the others wait for its result.
+"""
+
+import threading
+import functools
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class Flight:
+    """
+    A computation in progress, which other callers can wait on
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self) -> Any:
+        """
+        :return: the result of the computation, or raise the exception it raised
+        """
+        self.done.wait()
+        if self.error:
+            raise self.error
+        return self.value
+
+
+class VersionedCache:
+    """
+    Cache values against the data version that they were computed from
+    """
+
+    version: Callable[[], int]
+    entries: Dict[Hashable, Tuple[int, Any]]
+    flights: Dict[Tuple[Hashable, int], Flight]
+
+    def __init__(self, version: Callable[[], int]):
+        """
+        :param version: a callable that returns the current version of the data; it should be cheap
+        """
+        self.version = version
+        self.entries = {}
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for this key if it is for the current version, otherwise compute it
+        :param key: identifies the value
+        :param compute: a callable to produce the value
+        :return: the value
+        """
+        version = self.version()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            flight = self.flights.get((key, version))
+            if flight:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = Flight()
+                self.flights[(key, version)] = flight
+                leader = True
+        if not leader:
+            return flight.wait()
+        try:
+            flight.value = compute()
+            with self.lock:
+                self.entries[key] = (version, flight.value)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self.lock:
+                del self.flights[(key, version)]
+            flight.done.set()
+        return flight.wait()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: counts of hits, misses and coalesced requests, and the hit ratio, where coalesced requests count as hits
+        """
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            ratio = (self.hits + self.coalesced) / lookups if lookups else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": ratio,
+            }
+
+    def cached(self, function: Callable) -> Callable:
+        """
+        A decorator to cache a function in this cache, keyed on its name and arguments
+        :param function: the function to cache
+        :return: the wrapped function
+        """
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            key = (function.__qualname__,) + args
+            return self.get(key, lambda: function(*args))
+
+        return wrapper
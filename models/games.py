@@ -1,13 +1,21 @@
-import os
-import streamlit as st
-import pymongo
-from typing import List, Self, Dict, Self
+import functools
+import itertools
+from typing import TYPE_CHECKING, List, Self, Dict, Self, Iterator, Iterable, Any, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
-import pandas as pd
-import trueskill
 from trueskill import Rating
 import json
+from models.standings import Standing
+from models.ratings import RatingSnapshot, RatingPoint
+from models.stores import Store
+from models.cache import VersionedCache
+from models import head_to_head
+from models.transcripts import Transcript
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+cache = VersionedCache(lambda: Store.current().version())
 
 
 class Result(BaseModel):
@@ -21,14 +29,15 @@ class Result(BaseModel):
     coins: int
     rank: int
 
-    def __init__(self, **args):
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> Self:
         """
-        If necessary, fix this up so that different minor model variants have the same name
-        :return: self
+        Build a Result from a trusted stored document without running pydantic validation
+        Any fields left out by a projection are simply absent
+        :param doc: the stored result
+        :return: a Result instance
         """
-        super().__init__(**args)
-        if self.llm.startswith("claude-3-5-sonnet"):
-            self.llm = "claude-3.5-sonnet"
+        return cls.model_construct(**doc)
 
     def __repr__(self) -> str:
         """
@@ -37,32 +46,18 @@ class Result(BaseModel):
         """
         return json.dumps(self.model_dump())
 
-    def update_on(self, df: pd.DataFrame) -> None:
-        """
-        Add this result to the DataFrame for the leaderboard
-        This is perhaps more complex than needed because the dataframe only has Win %, not a count of Wins
-        :param df: the dataframe for the leaderboard
-        """
-        llm = self.llm
-        if not (df["LLM"] == llm).any():
-            df.loc[len(df)] = [llm, 0, 0.0, 0.0]
-        games = df.loc[df["LLM"] == llm, "Games"].values[0]
-        wins_percent = df.loc[df["LLM"] == llm, "Win %"].values[0]
-        wins = games * wins_percent / 100
-        df.loc[df["LLM"] == llm, "Games"] += 1
-        if self.rank == 0:
-            df.loc[df["LLM"] == llm, "Win %"] = (wins + 1) * 100 / (games + 1)
-        else:
-            df.loc[df["LLM"] == llm, "Win %"] = wins * 100 / (games + 1)
-
 
 class Game(BaseModel):
     """
     The result of a Game, stored in the DB
+    All storage is delegated to the configured Store, so this works the same with MongoDB or a local SQLite file
+    Leaderboard queries are cached across sessions until the version of the stored data changes
     """
 
     run_date: datetime
     results: List[Result]
+    game_id: Optional[str] = None
+    alliances: List[List[str]] = []
 
     def __str__(self) -> str:
         """
@@ -70,93 +65,272 @@ class Game(BaseModel):
         """
         return json.dumps(self.model_dump())
 
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> Self:
+        """
+        Build a Game from a trusted stored document without running pydantic validation
+        This is several times faster than Game(**doc), which matters when reading the whole collection
+        :param doc: the stored game
+        :return: a Game instance
+        """
+        fields = {"results": [Result.from_document(result) for result in doc.get("results", [])]}
+        for field in ["run_date", "game_id", "alliances"]:
+            if field in doc:
+                fields[field] = doc[field]
+        return cls.model_construct(**fields)
+
     @staticmethod
-    @st.cache_resource
-    def get_connection():
-        mongo_uri = os.getenv("MONGO_URI")
-        return pymongo.MongoClient(mongo_uri)
+    def store() -> Store:
+        """
+        :return: the configured storage backend
+        """
+        return Store.current()
+
+    @classmethod
+    @functools.cache
+    def prepare_database(cls) -> None:
+        """
+        Create and verify indexes, and migrate stored games to the current schema; once per process
+        """
+        cls.store()
+
+    @classmethod
+    def documents(cls, after: Any = None, results_only: bool = False) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        """
+        Stream the raw stored games in the order they were recorded, fetching them in batches
+        Only 1 batch is held in memory at a time, however large the collection grows
+        :param after: only games recorded after the game with this id, or None for all of them
+        :param results_only: if True, the results need only include the llm and rank
+        :return: an iterator of (id, document) pairs
+        """
+        return cls.store().iterate(after, results_only)
+
+    @classmethod
+    def stream(cls, after: Any = None, results_only: bool = False) -> Iterator[Self]:
+        """
+        Stream the stored games as lightweight Game objects; see documents() for the parameters
+        :return: an iterator of Games
+        """
+        for _, doc in cls.documents(after, results_only):
+            yield cls.from_document(doc)
 
     @classmethod
-    @st.cache_data(ttl=1)
     def all(cls) -> List[Self]:
-        client = cls.get_connection()
-        games = client.outsmart.games
-        docs = list(games.find())
-        return [Game(**doc) for doc in docs]
+        """
+        Prefer stream() to this, unless the whole collection really needs to be in memory at once
+        :return: every game recorded
+        """
+        return list(cls.stream())
 
     def save(self):
-        client = self.get_connection()
-        games = client.outsmart.games
-        games.insert_one(self.model_dump())
+        self.save_many([self])
+
+    @classmethod
+    def save_many(cls, games: List[Self]) -> int:
+        """
+        Record a batch of games, and apply them to the standings
+        Games carrying a game_id that is already stored are skipped, so a batch can safely be retried
+        :param games: the games to save
+        :return: the number of games that were newly recorded
+        """
+        inserted = cls.store().save([game.model_dump() for game in games])
+        return len(inserted)
+
+    @classmethod
+    def save_transcripts(cls, transcripts: List[Transcript]) -> None:
+        """
+        Compress and store full game transcripts, apart from the games themselves
+        :param transcripts: the transcripts to save
+        """
+        rows = [(transcript.game_id, *transcript.compress()) for transcript in transcripts]
+        cls.store().save_transcripts(rows)
+
+    @classmethod
+    def transcript(cls, game_id: str) -> Optional[Transcript]:
+        """
+        Load the full transcript of a game; this is only done when someone drills into the game
+        :param game_id: the game
+        :return: its transcript, or None if there isn't one
+        """
+        stored = cls.store().load_transcript(game_id)
+        return Transcript.decompress(*stored) if stored else None
+
+    @classmethod
+    def standings(cls) -> List[Standing]:
+        """
+        Read the materialized standings; there is 1 small record per model
+        Games recorded before the standings were maintained are built into them when the store is first prepared
+        :return: a list of Standing objects, 1 for each LLM
+        """
+        return cls.store().aggregate()
+
+    @classmethod
+    def rebuild_standings(cls) -> List[Standing]:
+        """
+        Recreate the materialized standings from the full history of games
+        The store does this once by itself, for games recorded before the standings existed
+        :return: the rebuilt list of Standing objects
+        """
+        return cls.store().rebuild_standings()
 
     @classmethod
-    @st.cache_data(ttl=1)
+    @cache.cached
     def count(cls) -> int:
-        client = cls.get_connection()
-        return client.outsmart.games.count_documents({})
+        """
+        :return: the number of games recorded
+        """
+        return cls.store().count()
 
     @classmethod
-    @st.cache_data(ttl=2)
     def reset(cls):
-        client = cls.get_connection()
-        client.outsmart.games.delete_many({})
+        cls.store().reset()
 
     @classmethod
-    @st.cache_data(ttl=1)
+    @cache.cached
     def latest(cls, k: int) -> List[Self]:
-        client = cls.get_connection()
-        games = client.outsmart.games
-        latest = games.find().sort({"run_date": -1}).limit(k)
-        return [Game(**each) for each in latest]
+        return [cls.from_document(doc) for doc in cls.store().latest(k)]
 
     @classmethod
-    def ratings_for(cls, games: List[Self], df: pd.DataFrame) -> Dict[str, Rating]:
+    def ratings_for(cls, games: Iterable[Self], df: "pd.DataFrame") -> Dict[str, Rating]:
         """
-        Create a Rating object for each LLM in the list of historic games
-        :param games: a list of historic games
+        Create a Rating object for each LLM in the historic games, by replaying all of them
+        :param games: historic games; this can be a stream
         :param df: a dataframe with the ranks of past games
         :return: a dictionary that maps models to their Rating objects
         """
-        ratings = {row["LLM"]: Rating() for _, row in df.iterrows()}
+        snapshot = RatingSnapshot()
         for game in games:
             llms = [result.llm for result in game.results]
-            rating_groups = [(ratings[llm],) for llm in llms]
             ranks = [result.rank for result in game.results]
-            rated = trueskill.rate(rating_groups, ranks=ranks)
-            for index, llm in enumerate(llms):
-                ratings[llm] = rated[index][0]
-        return ratings
+            snapshot.apply(None, game.run_date, llms, ranks)
+        return {row["LLM"]: snapshot.rating(row["LLM"]) for _, row in df.iterrows()}
+
+    @classmethod
+    def refresh_ratings(cls) -> RatingSnapshot:
+        """
+        Bring the checkpointed TrueSkill ratings up to date by applying only the games stored since the last
+        checkpoint, in the order they were saved. The new checkpoint and the per-model history are persisted after
+        every batch of games, so that a first build over a long history never holds all of its history in memory.
+        Where the store can commit games out of order, the games just before the checkpoint are looked at again,
+        and any that it doesn't include yet are applied.
+        If another session moved the checkpoint on in the meantime, its work is kept and ours is discarded.
+        :return: the up to date RatingSnapshot
+        """
+        store = cls.store()
+        stored = store.load_ratings()
+        snapshot = stored or RatingSnapshot(recent=[])
+        create = stored is None
+        applied = set(snapshot.recent or [])
+        after = snapshot.last_id if snapshot.recent is None else store.rescan_after(snapshot.last_id)
+        documents = cls.documents(after, results_only=True)
+        while batch := list(itertools.islice(documents, store.BATCH_SIZE)):
+            previous_games = snapshot.games
+            recent = snapshot.recent or []
+            points: List[RatingPoint] = []
+            for doc_id, doc in batch:
+                if doc_id in applied:
+                    continue
+                llms = [result["llm"] for result in doc["results"]]
+                ranks = [result["rank"] for result in doc["results"]]
+                points.extend(snapshot.apply(doc_id, doc["run_date"], llms, ranks))
+                recent.append(doc_id)
+            if not points:
+                continue
+            window = store.rescan_after(snapshot.last_id)
+            snapshot.recent = [doc_id for doc_id in recent if window is None or doc_id > window]
+            if not store.save_ratings(snapshot, previous_games, create=create):
+                return store.load_ratings()
+            store.add_rating_history(points)
+            create = False
+        return snapshot
+
+    @classmethod
+    def rebuild_ratings(cls) -> RatingSnapshot:
+        """
+        Throw away the checkpoint and the rating history, and replay every game from the beginning
+        :return: the rebuilt RatingSnapshot
+        """
+        cls.store().clear_ratings()
+        return cls.refresh_ratings()
 
     @classmethod
-    def games_df(cls) -> pd.DataFrame:
+    @cache.cached
+    def rating_history(cls, llm: str) -> "pd.DataFrame":
+        """
+        Create a table of how the Skill of a model has moved over time, for a trend chart
+        :param llm: the name of the model
+        :return: a DataFrame with the Skill after each game this model played
+        """
+        import pandas as pd
+
+        return pd.DataFrame(cls.store().rating_history(llm), columns=["When", "Skill"])
+
+    @classmethod
+    @cache.cached
+    def games_df(cls) -> "pd.DataFrame":
         """
         Create a dataframe that represents the leaderboard for games played
-        Use the TrueSkill methodology to assess Skill level
+        Use the TrueSkill methodology to assess Skill level, applying only the games since the last checkpoint
         The expose method calculates 1 number (mean - 3 * standard deviation) for the leaderboard
-        :return: a DataFrame with the leaderboard including Win % and Skill
+        Games, Win % and Avg Coins come straight from the materialized standings
+        Win % comes with a 95% confidence interval, and Skill with a 95% interval of the TrueSkill mean it's based on
+        :return: a DataFrame with the leaderboard including Win %, Avg Coins and Skill
         """
-        columns = ["LLM", "Games", "Win %", "Skill"]
-        df = pd.DataFrame(columns=columns)
-        games = cls.all()
-        for game in games:
-            for result in game.results:
-                result.update_on(df)
-        ratings = cls.ratings_for(games, df)
-        for llm, rating in ratings.items():
-            df.loc[df["LLM"] == llm, "Skill"] = trueskill.expose(rating)
-        return df
+        import pandas as pd
+        from models.intervals import win_intervals, mu_intervals
+
+        columns = ["LLM", "Games", "Win %", "Win % CI", "Avg Coins", "Skill", "Mu CI"]
+        snapshot = cls.refresh_ratings()
+        skills = snapshot.skills()
+        standings = cls.standings()
+        win_low, win_high = win_intervals([s.wins for s in standings], [s.games for s in standings])
+        ratings = [snapshot.rating(s.llm) for s in standings]
+        mu_low, mu_high = mu_intervals([r.mu for r in ratings], [r.sigma for r in ratings])
+        rows = [
+            [
+                s.llm,
+                s.games,
+                s.win_percent,
+                f"{win_low[i]:.1f} - {win_high[i]:.1f}",
+                s.average_coins,
+                skills.get(s.llm, 0.0),
+                f"{mu_low[i]:.1f} - {mu_high[i]:.1f}",
+            ]
+            for i, s in enumerate(standings)
+        ]
+        return pd.DataFrame(rows, columns=columns)
 
     @classmethod
-    def latest_df(cls) -> pd.DataFrame:
+    def rebuild_head_to_head(cls) -> List[Dict[str, Any]]:
+        """
+        Recreate the materialized head-to-head pairs from the full history of games, vectorized with NumPy
+        The store does this once by itself, for games recorded before the pairs were maintained
+        :return: the rebuilt rows
+        """
+        rows = head_to_head.compute(doc for _, doc in cls.documents())
+        cls.store().replace_head_to_head(rows)
+        return rows
+
+    @classmethod
+    @cache.cached
+    def head_to_head_df(cls, metric: str) -> "pd.DataFrame":
+        """
+        Create a matrix of how each model has fared against each other model
+        :param metric: which measure to show; one of the keys of head_to_head.METRICS
+        :return: a DataFrame with a row for each model and a column for each opponent
+        """
+        return head_to_head.matrix(cls.store().head_to_head(), metric)
+
+    @classmethod
+    @cache.cached
+    def latest_df(cls) -> "pd.DataFrame":
         """
         Create a table of the most recent 5 games
+        Only the dates, ids and winning model names are fetched from the store
         :return: A dataframe to represent the winners of the last 5 games
         """
-        columns = ["When", "Winner(s)"]
-        df = pd.DataFrame(columns=columns)
-        for game in cls.latest(5):
-            when = game.run_date
-            winners = [result.llm for result in game.results if result.rank == 0]
-            winners_str = ", ".join(winners)
-            df.loc[len(df)] = [when, winners_str]
-        return df
+        import pandas as pd
+
+        columns = ["When", "Winner(s)", "Game"]
+        rows = [[when, ", ".join(winners), game_id] for when, winners, game_id in cls.store().latest_winners(5)]
+        return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,124 @@
+"""
+The head-to-head record between every pair of models: how often they played together, who finished ahead,
+the average coin differential and how often they formed an alliance.
+Each saved game adds to a materialized table of pairs in O(players^2); rebuilding from the full history
+is vectorized with NumPy over arrays of results, so it loops over seat positions rather than games.
+NumPy and pandas are only imported for the rebuild and the display, so saving a game doesn't load them.
+"""
+
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+Document = Dict[str, Any]
+
+FIELDS = ["games", "ahead", "coin_diff", "alliances"]
+
+METRICS = {
+    "Finished ahead %": lambda m: 100 * m["ahead"] / m["games"],
+    "Avg coin difference": lambda m: m["coin_diff"] / m["games"],
+    "Alliances per game": lambda m: m["alliances"] / m["games"],
+    "Games together": lambda m: m["games"],
+}
+
+
+def alliance_pairs(doc: Document) -> List[Tuple[str, str]]:
+    """
+    :param doc: a stored game
+    :return: the pair of models for each alliance formed during the game
+    """
+    llms = {result["name"]: result["llm"] for result in doc["results"]}
+    return [(llms[a], llms[b]) for a, b in doc.get("alliances", []) if a in llms and b in llms]
+
+
+def increments(doc: Document) -> List[Tuple[str, str, Dict[str, int]]]:
+    """
+    The changes to the head-to-head table from 1 game, for each ordered pair of models that played
+    :param doc: a game that has just been saved
+    :return: a list of (model, opponent, increments) for every ordered pair
+    """
+    alliances: Dict[Tuple[str, str], int] = {}
+    for a, b in alliance_pairs(doc):
+        alliances[(a, b)] = alliances.get((a, b), 0) + 1
+        alliances[(b, a)] = alliances.get((b, a), 0) + 1
+    changes = []
+    for index, mine in enumerate(doc["results"]):
+        for other_index, theirs in enumerate(doc["results"]):
+            if index == other_index:
+                continue
+            pair = (mine["llm"], theirs["llm"])
+            change = {
+                "games": 1,
+                "ahead": 1 if mine["rank"] < theirs["rank"] else 0,
+                "coin_diff": mine["coins"] - theirs["coins"],
+                "alliances": alliances.get(pair, 0),
+            }
+            changes.append((pair[0], pair[1], change))
+    return changes
+
+
+def compute(docs: Iterable[Document]) -> List[Document]:
+    """
+    Build the head-to-head table from scratch, vectorized over all the games
+    Games are grouped by number of players, so each group is a dense (games x seats) array;
+    while streaming, the values are packed into compact typed arrays rather than Python lists
+    :param docs: every stored game; this can be a stream
+    :return: 1 row per ordered pair of models that have played together
+    """
+    import numpy as np
+
+    index: Dict[str, int] = {}
+    by_size: Dict[int, Tuple[array, array, array]] = {}
+    allied = array("q")
+    for doc in docs:
+        results = doc["results"]
+        llms, ranks, coins = by_size.setdefault(len(results), (array("q"), array("q"), array("q")))
+        for result in results:
+            llms.append(index.setdefault(result["llm"], len(index)))
+            ranks.append(result["rank"])
+            coins.append(result["coins"])
+        for a, b in alliance_pairs(doc):
+            allied.extend((index[a], index[b]))
+
+    n = len(index)
+    totals = {field: np.zeros((n, n), dtype=np.int64) for field in FIELDS}
+    for size, packed in by_size.items():
+        llms, ranks, coins = (np.frombuffer(values, dtype=np.int64).reshape(-1, size) for values in packed)
+        for i in range(size):
+            for j in range(size):
+                if i == j:
+                    continue
+                pair = (llms[:, i], llms[:, j])
+                np.add.at(totals["games"], pair, 1)
+                np.add.at(totals["ahead"], pair, (ranks[:, i] < ranks[:, j]).astype(np.int64))
+                np.add.at(totals["coin_diff"], pair, coins[:, i] - coins[:, j])
+    if allied:
+        a, b = np.frombuffer(allied, dtype=np.int64).reshape(-1, 2).T
+        np.add.at(totals["alliances"], (a, b), 1)
+        np.add.at(totals["alliances"], (b, a), 1)
+
+    names = list(index)
+    rows = []
+    for i, j in zip(*np.nonzero(totals["games"])):
+        row = {"a": names[i], "b": names[j]}
+        row |= {field: int(totals[field][i, j]) for field in FIELDS}
+        rows.append(row)
+    return rows
+
+
+def matrix(rows: List[Document], metric: str) -> "pd.DataFrame":
+    """
+    Pivot the head-to-head rows into a square matrix for display
+    :param rows: the materialized head-to-head rows
+    :param metric: one of the keys of METRICS
+    :return: a DataFrame with a row for each model and a column for each opponent
+    """
+    import pandas as pd
+
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    df["value"] = METRICS[metric](df)
+    return df.pivot(index="a", columns="b", values="value").rename_axis(index="LLM", columns=None)
@@ -0,0 +1,55 @@
+"""
+Confidence intervals for the leaderboard, so that models with a handful of games can be told apart from
+models with thousands.
+"""
+
+from statistics import NormalDist
+from typing import Tuple
+import numpy as np
+
+RESAMPLES = 4000
+CONFIDENCE = 0.95
+SEED = 0
+
+
+def win_intervals(
+    wins: np.ndarray, games: np.ndarray, resamples: int = RESAMPLES, confidence: float = CONFIDENCE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A credible interval for the Win % of every model at once.
+    With a uniform prior, the win rate of a model with w wins in n games follows Beta(w + 1, n - w + 1), so all the
+    draws for all the models are made in a single vectorized call. Unlike resampling the games themselves, this
+    stays wide for a model that has won or lost every one of a handful of games.
+    A fixed seed keeps the intervals stable between refreshes.
+    :param wins: the number of wins of each model
+    :param games: the number of games of each model
+    :param resamples: how many draws to make from each posterior
+    :param confidence: the coverage of the interval
+    :return: arrays of the low and high ends of the interval, as percentages
+    """
+    games = np.asarray(games, dtype=np.int64)
+    wins = np.asarray(wins, dtype=np.int64)
+    if games.size == 0:
+        return np.array([]), np.array([])
+    rng = np.random.default_rng(SEED)
+    draws = rng.beta(wins + 1, games - wins + 1, size=(resamples, games.size)) * 100
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(draws, [tail, 1 - tail], axis=0)
+    return low, high
+
+
+def mu_intervals(mu: np.ndarray, sigma: np.ndarray, confidence: float = CONFIDENCE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A credible interval for the TrueSkill mean, mu, of every model.
+    Replaying TrueSkill over thousands of resampled histories would be sequential and far too slow, but the
+    TrueSkill rating is already a Gaussian posterior N(mu, sigma), so the interval is mu plus or minus z sigma.
+    Skill, mu less 3 sigma, is a conservative point below this range rather than its centre.
+    :param mu: the mean of each model's rating
+    :param sigma: the standard deviation of each model's rating
+    :param confidence: the coverage of the interval
+    :return: arrays of the low and high ends of the interval
+    """
+    mu = np.asarray(mu, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return mu - z * sigma, mu + z * sigma
@@ -1,5 +1,9 @@
+import json
+import re
 from pydantic import BaseModel, Field
-from typing import Dict
+from typing import Dict, List, Tuple
+
+DRAFT_FIELD = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*"((?:[^"\\]|\\.)*)')
 
 
 class Move(BaseModel):
@@ -11,3 +15,21 @@ class Move(BaseModel):
     give: str = Field(alias="give coin to")
     take: str = Field(alias="take coin from")
     messages: Dict[str, str] = Field(alias="private messages")
+
+
+def draft_fields(text: str) -> List[Tuple[str, str]]:
+    """
+    Pick out the string fields from a response that is still being streamed, so it isn't yet valid JSON
+    The last field may be cut off part way through its value
+    :param text: the response so far
+    :return: a list of (key, value) for each string field found so far, including the private messages
+    """
+    fields = []
+    for match in DRAFT_FIELD.finditer(text):
+        key, value = match.group(1), match.group(2).rstrip("\\")
+        try:
+            value = json.loads(f'"{value}"')
+        except ValueError:
+            pass
+        fields.append((key, value))
+    return fields
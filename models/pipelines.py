@@ -0,0 +1,75 @@
+"""
+MongoDB aggregation pipelines over the outsmart.games collection
+These let the server do the counting, so only the small aggregated result is transferred
+"""
+
+from typing import List, Dict, Any
+
+Pipeline = List[Dict[str, Any]]
+
+
+def standings() -> Pipeline:
+    """
+    A pipeline that produces 1 document per model, in the same shape as the Standing class:
+    games, wins, the sum of coins and a histogram of ranks
+    :return: the pipeline stages
+    """
+    return [
+        {"$unwind": "$results"},
+        {
+            "$group": {
+                "_id": {"llm": "$results.llm", "rank": "$results.rank"},
+                "count": {"$sum": 1},
+                "coins": {"$sum": "$results.coins"},
+            }
+        },
+        {
+            "$group": {
+                "_id": "$_id.llm",
+                "games": {"$sum": "$count"},
+                "wins": {"$sum": {"$cond": [{"$eq": ["$_id.rank", 0]}, "$count", 0]}},
+                "coins": {"$sum": "$coins"},
+                "ranks": {"$push": {"k": {"$toString": "$_id.rank"}, "v": "$count"}},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "llm": "$_id",
+                "games": 1,
+                "wins": 1,
+                "coins": 1,
+                "ranks": {"$arrayToObject": "$ranks"},
+            }
+        },
+    ]
+
+
+def latest_winners(k: int) -> Pipeline:
+    """
+    A pipeline that produces the date, the game_id and the winning models of the most recent k games
+    :param k: how many games
+    :return: the pipeline stages
+    """
+    return [
+        {"$sort": {"run_date": -1}},
+        {"$limit": k},
+        {
+            "$project": {
+                "_id": 0,
+                "run_date": 1,
+                "game_id": 1,
+                "winners": {
+                    "$map": {
+                        "input": {
+                            "$filter": {
+                                "input": "$results",
+                                "cond": {"$eq": ["$$this.rank", 0]},
+                            }
+                        },
+                        "in": "$$this.llm",
+                    }
+                },
+            }
+        },
+    ]
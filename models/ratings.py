@@ -0,0 +1,125 @@
+from typing import Dict, List, Optional, Tuple, Any
+from datetime import datetime
+from pydantic import BaseModel
+import trueskill
+from trueskill import Rating
+
+
+class RatingPoint(BaseModel):
+    """
+    The TrueSkill rating of 1 LLM immediately after a particular game; used for trend charts
+    """
+
+    llm: str
+    run_date: datetime
+    mu: float
+    sigma: float
+    skill: float
+
+
+class RatingSnapshot(BaseModel):
+    """
+    A checkpoint of the TrueSkill ratings of every LLM, along with the last game that was applied
+    Only games after the checkpoint need to be applied to bring the ratings up to date; where ids aren't assigned
+    in the order that games are committed, recent holds the ids applied near the checkpoint, so that games
+    committed late can be picked up without applying any game twice. It's None for checkpoints from before then.
+    """
+
+    ratings: Dict[str, Tuple[float, float]] = {}
+    last_id: Optional[Any] = None
+    last_run_date: Optional[datetime] = None
+    games: int = 0
+    recent: Optional[List[Any]] = None
+
+    def rating(self, llm: str) -> Rating:
+        """
+        :param llm: the name of the model
+        :return: the current Rating for this model, or a fresh one if it hasn't played yet
+        """
+        if llm in self.ratings:
+            mu, sigma = self.ratings[llm]
+            return Rating(mu=mu, sigma=sigma)
+        return Rating()
+
+    def apply(self, doc_id: Any, run_date: datetime, llms: List[str], ranks: List[int]) -> List[RatingPoint]:
+        """
+        Apply 1 game to the ratings, and move the checkpoint on to this game if it's the latest so far
+        :param doc_id: the id of the stored game
+        :param run_date: when the game was played
+        :param llms: the models that played
+        :param ranks: their ranks, where 0 means that it won
+        :return: the new rating of each model that played, for the history
+        """
+        rating_groups = [(self.rating(llm),) for llm in llms]
+        rated = trueskill.rate(rating_groups, ranks=ranks)
+        points = []
+        for llm, (rating,) in zip(llms, rated):
+            self.ratings[llm] = (rating.mu, rating.sigma)
+            skill = trueskill.expose(rating)
+            points.append(
+                RatingPoint(llm=llm, run_date=run_date, mu=rating.mu, sigma=rating.sigma, skill=skill)
+            )
+        if self.last_id is None or doc_id > self.last_id:
+            self.last_id = doc_id
+            self.last_run_date = run_date
+        self.games += 1
+        return points
+
+    def to_document(self) -> Dict[str, Any]:
+        """
+        Model names can contain dots, so store the ratings as a list rather than a mapping
+        :return: a document to be stored in the ratings collection
+        """
+        return {
+            "ratings": [{"llm": llm, "mu": mu, "sigma": sigma} for llm, (mu, sigma) in self.ratings.items()],
+            "last_id": self.last_id,
+            "last_run_date": self.last_run_date,
+            "games": self.games,
+            "recent": self.recent,
+        }
+
+    @classmethod
+    def from_document(cls, doc: Optional[Dict[str, Any]]) -> "RatingSnapshot":
+        """
+        :param doc: a document from the ratings collection, or None if there isn't one yet
+        :return: the RatingSnapshot it represents, or an empty one
+        """
+        if not doc:
+            return cls()
+        ratings = {r["llm"]: (r["mu"], r["sigma"]) for r in doc.get("ratings", [])}
+        return cls(
+            ratings=ratings,
+            last_id=doc.get("last_id"),
+            last_run_date=doc.get("last_run_date"),
+            games=doc.get("games", 0),
+            recent=doc.get("recent"),
+        )
+
+    def skills(self) -> Dict[str, float]:
+        """
+        :return: a mapping from model to the single Skill number shown on the leaderboard
+        """
+        return {llm: trueskill.expose(self.rating(llm)) for llm in self.ratings}
+
+
+def main() -> None:
+    """
+    Bring the checkpointed ratings up to date, or rebuild them from scratch with --rebuild
+    Run with: python -m models.ratings [--rebuild]
+    """
+    import argparse
+    from dotenv import load_dotenv
+    from models.games import Game
+
+    parser = argparse.ArgumentParser(description="Refresh or rebuild the TrueSkill rating snapshot")
+    parser.add_argument("--rebuild", action="store_true", help="replay every game from the beginning")
+    args = parser.parse_args()
+    load_dotenv(override=True)
+    snapshot = Game.rebuild_ratings() if args.rebuild else Game.refresh_ratings()
+    print(f"Ratings include {snapshot.games:,} games, up to {snapshot.last_run_date}")
+    for llm, skill in sorted(snapshot.skills().items(), key=lambda item: -item[1]):
+        print(f"{llm:>30} {skill:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Self
+from typing import Optional, List, Dict, Self, Any
 from models.moves import Move
 
 
@@ -35,6 +35,37 @@ class TurnRecord:
         self.messages = {}
         self.move = move
 
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: a plain dictionary of this TurnRecord, suitable for storing as JSON
+        """
+        return {
+            "name": self.name,
+            "turn": self.turn,
+            "is_invalid_move": self.is_invalid_move,
+            "move": self.move.model_dump(by_alias=True) if self.move else None,
+            "givers": self.givers,
+            "takers": self.takers,
+            "alliances_with": self.alliances_with,
+            "alliances_against": self.alliances_against,
+            "messages": self.messages,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> Self:
+        """
+        :param d: a dictionary created by to_dict
+        :return: the TurnRecord it represents
+        """
+        move = Move(**d["move"]) if d.get("move") else None
+        record = cls(d["name"], d["turn"], move=move, is_invalid_move=d["is_invalid_move"])
+        record.givers = d["givers"]
+        record.takers = d["takers"]
+        record.alliances_with = d["alliances_with"]
+        record.alliances_against = d["alliances_against"]
+        record.messages = d["messages"]
+        return record
+
     def __repr__(self) -> str:
         """
         Convert this TurnRecord into text; this is used to describe historic moves when making the prompt
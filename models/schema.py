@@ -0,0 +1,107 @@
+"""
+Index management and schema migration for the outsmart database on MongoDB
+This runs once per process at startup, when the MongoStore is created, and can also be run by hand:
+python -m models.schema
+"""
+
+import logging
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+# The same values as pymongo.ASCENDING and pymongo.DESCENDING, so that pymongo is only imported with a MongoStore
+ASCENDING = 1
+DESCENDING = -1
+
+SCHEMA_VERSION = 2
+
+IndexSpec = List[Tuple[str, int]]
+
+INDEXES: Dict[str, List[Tuple[IndexSpec, Dict]]] = {
+    "games": [
+        ([("run_date", DESCENDING)], {}),
+        ([("results.llm", ASCENDING)], {}),
+        (
+            [("game_id", ASCENDING)],
+            {"unique": True, "partialFilterExpression": {"game_id": {"$type": "string"}}},
+        ),
+    ],
+    "standings": [
+        ([("llm", ASCENDING)], {"unique": True}),
+    ],
+    "head_to_head": [
+        ([("a", ASCENDING), ("b", ASCENDING)], {"unique": True}),
+    ],
+    "rating_history": [
+        ([("llm", ASCENDING), ("run_date", ASCENDING)], {}),
+    ],
+}
+
+# Minor variants of a model that are reported under 1 name on the leaderboard
+LEGACY_NAMES = {"claude-3-5-sonnet": "claude-3.5-sonnet"}
+
+
+def ensure_indexes(db: "Database") -> None:
+    """
+    Create any indexes that are missing, then verify that every one of them exists
+    :param db: the outsmart database
+    """
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            db[collection].create_index(keys, **options)
+        existing = [spec["key"] for spec in db[collection].index_information().values()]
+        for keys, _ in indexes:
+            if keys not in existing:
+                raise RuntimeError(f"Index {keys} is missing from {collection}")
+    logger.info("Database indexes verified")
+
+
+def migrate(db: "Database") -> None:
+    """
+    Bring every stored game up to the current schema version:
+    Version 2 stores the normalized name of legacy models, so that reads no longer need to rewrite them
+    :param db: the outsmart database
+    """
+    meta = db.meta.find_one({"_id": "schema"})
+    if meta and meta.get("version", 0) >= SCHEMA_VERSION:
+        return
+    games = db.games
+    for prefix, normalized in LEGACY_NAMES.items():
+        legacy = {"$regex": f"^{prefix}"}
+        update = games.update_many(
+            {"results.llm": legacy},
+            {"$set": {"results.$[r].llm": normalized}},
+            array_filters=[{"r.llm": legacy}],
+        )
+        logger.info(f"Renamed {prefix}* to {normalized} in {update.modified_count:,} games")
+    outdated = {
+        "$or": [
+            {"schema_version": {"$exists": False}},
+            {"schema_version": {"$lt": SCHEMA_VERSION}},
+        ]
+    }
+    update = games.update_many(outdated, {"$set": {"schema_version": SCHEMA_VERSION}})
+    logger.info(f"Migrated {update.modified_count:,} games to schema version {SCHEMA_VERSION}")
+    db.meta.update_one({"_id": "schema"}, {"$set": {"version": SCHEMA_VERSION}}, upsert=True)
+
+
+def prepare(db: "Database") -> None:
+    """
+    Make sure that the database is ready to use
+    :param db: the outsmart database
+    """
+    ensure_indexes(db)
+    migrate(db)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from util.setup import setup_logger
+    from models.stores import Store
+
+    setup_logger(logging.getLogger())
+    load_dotenv(override=True)
+    Store.current()
@@ -0,0 +1,179 @@
+"""
+A prebuilt snapshot of the leaderboard, so that the sidebar never waits on the database
+A background thread watches the version of the stored data and rebuilds the snapshot whenever new games land.
+Each snapshot is also written to local files, as Parquet if a Parquet engine is installed or as pickles otherwise,
+so that a freshly started process can show the last leaderboard straight away while it checks for newer games.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Self
+from models.stores import Store
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+Frames = Dict[str, "pd.DataFrame"]
+
+
+class Snapshot:
+    """
+    The leaderboard tables as they were at 1 version of the stored data
+    """
+
+    version: int
+    built_at: datetime
+    frames: Frames
+
+    def __init__(self, version: int, built_at: datetime, frames: Frames):
+        self.version = version
+        self.built_at = built_at
+        self.frames = frames
+
+    def age(self) -> str:
+        """
+        :return: how long ago this snapshot was built, in words
+        """
+        seconds = int((datetime.now() - self.built_at).total_seconds())
+        if seconds < 60:
+            return "just now"
+        if seconds < 3600:
+            return f"{seconds // 60} min ago"
+        if seconds < 86400:
+            return f"{seconds // 3600} hr ago"
+        return f"{seconds // 86400} days ago"
+
+    def save(self, directory: str) -> None:
+        """
+        Write this snapshot to a directory, replacing any snapshot already there
+        :param directory: where to write it
+        """
+        os.makedirs(directory, exist_ok=True)
+        formats = {}
+        for name, df in self.frames.items():
+            try:
+                df.to_parquet(os.path.join(directory, f"{name}.parquet"), index=False)
+                formats[name] = "parquet"
+            except ImportError:
+                df.to_pickle(os.path.join(directory, f"{name}.pkl"))
+                formats[name] = "pkl"
+        meta = {"version": self.version, "built_at": self.built_at.isoformat(), "formats": formats}
+        path = os.path.join(directory, "snapshot.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional[Self]:
+        """
+        :param directory: where a snapshot was written
+        :return: the snapshot, or None if there isn't a readable one
+        """
+        import pandas as pd
+
+        try:
+            with open(os.path.join(directory, "snapshot.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            frames = {}
+            for name, fmt in meta["formats"].items():
+                path = os.path.join(directory, f"{name}.{fmt}")
+                frames[name] = pd.read_parquet(path) if fmt == "parquet" else pd.read_pickle(path)
+            return cls(meta["version"], datetime.fromisoformat(meta["built_at"]), frames)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error("Failed to load the leaderboard snapshot")
+            logger.error(e)
+            return None
+
+
+class SnapshotRefresher:
+    """
+    Keeps a Snapshot up to date with the stored data, on a background thread
+    Use SnapshotRefresher.instance() to get the 1 refresher for this process
+    """
+
+    build: Callable[[], Frames]
+    directory: str
+    snapshot: Optional[Snapshot]
+    thread: threading.Thread
+
+    INTERVAL = 5.0
+    DEFAULT_DIRECTORY = "outsmart_snapshot"
+
+    _instance: Optional[Self] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, build: Callable[[], Frames], directory: str):
+        """
+        Load the last snapshot written, if there is one, and start the background thread
+        :param build: computes the leaderboard tables from the stored data
+        :param directory: where snapshots are written
+        """
+        self.build = build
+        self.directory = directory
+        self.snapshot = Snapshot.load(directory)
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="snapshot-refresher", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def instance(cls, build: Callable[[], Frames]) -> Self:
+        """
+        :param build: computes the leaderboard tables; only used when the refresher is first created
+        :return: the refresher for this process, creating it on first use
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                directory = os.getenv("OUTSMART_SNAPSHOT", cls.DEFAULT_DIRECTORY)
+                cls._instance = cls(build, directory)
+            return cls._instance
+
+    def is_stale(self) -> bool:
+        """
+        :return: True if games have been saved since the snapshot was built; this needs a cheap read of the version
+        """
+        return self.snapshot is None or self.snapshot.version != Store.current().version()
+
+    def refresh(self) -> bool:
+        """
+        Rebuild the snapshot if the stored data has moved on since it was built
+        The version is read before building, so games that land during the build trigger another refresh
+        :return: True if a new snapshot was built
+        """
+        version = Store.current().version()
+        if self.snapshot and self.snapshot.version == version:
+            return False
+        snapshot = Snapshot(version, datetime.now(), self.build())
+        self.snapshot = snapshot
+        try:
+            snapshot.save(self.directory)
+        except Exception as e:
+            logger.error("Failed to write the leaderboard snapshot")
+            logger.error(e)
+        logger.info(f"Built the leaderboard snapshot for version {version}")
+        return True
+
+    def run(self) -> None:
+        """
+        The body of the background thread: check the version every INTERVAL seconds, or sooner if woken
+        """
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Failed to refresh the leaderboard snapshot")
+                logger.error(e)
+            self.wake.wait(self.INTERVAL)
+            self.wake.clear()
+
+    def poke(self) -> None:
+        """
+        Ask for a check right away, rather than at the next interval
+        """
+        self.wake.set()
@@ -0,0 +1,67 @@
+from typing import Dict, Any
+from pydantic import BaseModel
+import json
+
+
+class Standing(BaseModel):
+    """
+    The running totals for 1 LLM across every game that has been recorded.
+    These are maintained as each game is saved, so that the leaderboard can be read directly
+    rather than replaying every Result in the history
+    """
+
+    llm: str
+    games: int = 0
+    wins: int = 0
+    coins: int = 0
+    ranks: Dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        """
+        :return: a json string for this standing
+        """
+        return json.dumps(self.model_dump())
+
+    @property
+    def win_percent(self) -> float:
+        """
+        :return: the percentage of games that this LLM has won
+        """
+        return self.wins * 100 / self.games if self.games else 0.0
+
+    @property
+    def average_coins(self) -> float:
+        """
+        :return: the average number of coins this LLM finished with
+        """
+        return self.coins / self.games if self.games else 0.0
+
+    @staticmethod
+    def increments(rank: int, coins: int) -> Dict[str, int]:
+        """
+        The changes to make to a Standing to reflect 1 more result; shaped to be used as a $inc in Mongo
+        :param rank: the rank achieved in the game, where 0 means that it won
+        :param coins: the coins it ended with
+        :return: a mapping from field (using dotted notation for the rank histogram) to increment
+        """
+        return {
+            "games": 1,
+            "wins": 1 if rank == 0 else 0,
+            "coins": coins,
+            f"ranks.{rank}": 1,
+        }
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "Standing":
+        """
+        Create a Standing from a document in the standings collection
+        :param doc: the stored document
+        :return: a Standing instance
+        """
+        return cls(
+            llm=doc["llm"],
+            games=doc.get("games", 0),
+            wins=doc.get("wins", 0),
+            coins=doc.get("coins", 0),
+            ranks={str(k): v for k, v in doc.get("ranks", {}).items()},
+        )
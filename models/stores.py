@@ -0,0 +1,803 @@
+"""
+This module contains the storage backends for recorded games;
+There's an abstract base class Store with an implementation for MongoDB and an embedded one for SQLite.
+The class method Store.current() returns the backend configured by the environment:
+MONGO_URI selects MongoDB, otherwise OUTSMART_DB names a local SQLite file.
+pymongo is imported by the methods of MongoStore that need it, so it isn't loaded at all when using SQLite.
+Stores deal in plain documents shaped like Game.model_dump(), so this module has no knowledge of the Game class.
+"""
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Self, Tuple
+from models import pipelines, head_to_head
+from models.ratings import RatingPoint, RatingSnapshot
+from models.schema import SCHEMA_VERSION, prepare
+from models.standings import Standing
+
+Document = Dict[str, Any]
+
+DUPLICATE_KEY = 11000
+
+
+class Store(ABC):
+    """
+    An abstract base class for somewhere to record games and the leaderboard data derived from them
+    Use Store.current() to get the configured backend
+    """
+
+    BATCH_SIZE = 2000
+
+    _instance: Optional[Self] = None
+    _instance_lock = threading.Lock()
+
+    @staticmethod
+    def is_configured() -> bool:
+        """
+        :return: True if the environment names a backend, so that games can be recorded
+        """
+        return bool(os.getenv("MONGO_URI") or os.getenv("OUTSMART_DB"))
+
+    @classmethod
+    def current(cls) -> Self:
+        """
+        Create the configured backend on first use, and prepare it
+        :return: the Store for this process
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                if os.getenv("MONGO_URI"):
+                    store = MongoStore(os.getenv("MONGO_URI"))
+                elif os.getenv("OUTSMART_DB"):
+                    store = SQLiteStore(os.getenv("OUTSMART_DB"))
+                else:
+                    raise RuntimeError("No database is configured; set MONGO_URI or OUTSMART_DB")
+                store.prepare()
+                cls._instance = store
+            return cls._instance
+
+    def prepare(self) -> None:
+        """
+        Create indexes and migrate any stored data; implemented by subclasses as needed
+        """
+        pass
+
+    def backfill(self) -> None:
+        """
+        Build the materialized standings and head-to-head pairs from the full history of games, once, for games
+        recorded before they were maintained. This is recorded with a marker rather than judged by whether they
+        are empty, as games saved after an upgrade add their own rows to them.
+        """
+        if not self.is_built("standings"):
+            self.rebuild_standings()
+            self.mark_built("standings")
+            self.bump_version()
+        if not self.is_built("head_to_head"):
+            self.replace_head_to_head(head_to_head.compute(doc for _, doc in self.iterate()))
+            self.mark_built("head_to_head")
+
+    @abstractmethod
+    def is_built(self, name: str) -> bool:
+        """
+        :param name: a materialized view, such as "standings"
+        :return: True if it has been built from the full history of games
+        """
+
+    @abstractmethod
+    def mark_built(self, name: str) -> None:
+        """
+        Record that a materialized view has been built from the full history of games
+        :param name: the view, such as "standings"
+        """
+
+    @abstractmethod
+    def save(self, docs: List[Document]) -> List[Document]:
+        """
+        Record a batch of games and apply them to the standings
+        Games with a game_id that is already stored are skipped, so a batch can be retried
+        :param docs: the games, as documents
+        :return: the games that were newly recorded
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """
+        :return: the number of games recorded; this should be cheap
+        """
+
+    @abstractmethod
+    def version(self) -> int:
+        """
+        :return: a number that changes whenever the stored data changes; this should be cheap
+        """
+
+    @abstractmethod
+    def bump_version(self) -> None:
+        """
+        Record that the stored data has changed
+        """
+
+    @abstractmethod
+    def latest(self, k: int) -> List[Document]:
+        """
+        :param k: how many games
+        :return: the most recent k games, newest first
+        """
+
+    @abstractmethod
+    def latest_winners(self, k: int) -> List[Tuple[datetime, List[str], Optional[str]]]:
+        """
+        :param k: how many games
+        :return: the date, the winning models and the game_id of the most recent k games, newest first
+        """
+
+    @abstractmethod
+    def iterate(self, after: Any = None, results_only: bool = False) -> Iterator[Tuple[Any, Document]]:
+        """
+        Stream the games in the order they were recorded, in batches
+        :param after: only games recorded after the game with this id, or None for all of them
+        :param results_only: if True, the results need only include the llm and rank
+        :return: an iterator of (id, document) pairs, where each id sorts after the ones before it
+        """
+
+    @abstractmethod
+    def aggregate(self) -> List[Standing]:
+        """
+        :return: the per-model standings, which are built from the earlier games when the store is prepared
+        """
+
+    @abstractmethod
+    def rebuild_standings(self) -> List[Standing]:
+        """
+        Recreate the per-model standings from the full history of games
+        :return: the rebuilt standings
+        """
+
+    @abstractmethod
+    def head_to_head(self) -> List[Document]:
+        """
+        :return: the materialized head-to-head rows, 1 per ordered pair of models
+        """
+
+    @abstractmethod
+    def replace_head_to_head(self, rows: List[Document]) -> None:
+        """
+        Replace the materialized head-to-head rows, after rebuilding them from the full history
+        :param rows: the new rows
+        """
+
+    @abstractmethod
+    def save_transcripts(self, transcripts: List[Tuple[str, str, bytes]]) -> None:
+        """
+        Store compressed game transcripts apart from the games, replacing any already stored for the same game
+        :param transcripts: (game_id, codec, data) for each transcript
+        """
+
+    @abstractmethod
+    def load_transcript(self, game_id: str) -> Optional[Tuple[str, bytes]]:
+        """
+        :param game_id: the game
+        :return: the codec and compressed data of its transcript, or None if there isn't one
+        """
+
+    @abstractmethod
+    def load_ratings(self) -> Optional[RatingSnapshot]:
+        """
+        :return: the stored rating checkpoint, or None if there isn't one yet
+        """
+
+    def rescan_after(self, last_id: Any) -> Any:
+        """
+        Where to look for games that a rating checkpoint may not include yet
+        Ids here are assigned in the order that games are committed, so that's straight after the checkpoint
+        :param last_id: the last_id of the checkpoint
+        :return: the id after which to look
+        """
+        return last_id
+
+    @abstractmethod
+    def save_ratings(self, snapshot: RatingSnapshot, previous_games: int, create: bool) -> bool:
+        """
+        Store a new rating checkpoint, as long as nobody else has moved it on since it was loaded
+        :param snapshot: the new checkpoint
+        :param previous_games: the number of games in the checkpoint that was loaded
+        :param create: True if there was no checkpoint when it was loaded
+        :return: True if the checkpoint was stored
+        """
+
+    @abstractmethod
+    def add_rating_history(self, points: List[RatingPoint]) -> None:
+        """
+        :param points: ratings after each game, to be added to the history
+        """
+
+    @abstractmethod
+    def rating_history(self, llm: str) -> List[Tuple[datetime, float]]:
+        """
+        :param llm: the name of the model
+        :return: the date and the Skill after each game this model played, oldest first
+        """
+
+    @abstractmethod
+    def clear_ratings(self) -> None:
+        """
+        Remove the rating checkpoint and the history
+        """
+
+    @abstractmethod
+    def reset(self) -> None:
+        """
+        Remove everything that has been recorded
+        """
+
+
+class MongoStore(Store):
+    """
+    Games recorded in the outsmart database on a MongoDB server
+    """
+
+    # Longer than a save can take to commit, plus any skew between the clocks of the processes that save games
+    RESCAN_SECONDS = 10 * 60
+
+    def __init__(self, uri: str):
+        import pymongo
+
+        self.client = pymongo.MongoClient(uri)
+        self.db = self.client.outsmart
+
+    def prepare(self) -> None:
+        prepare(self.db)
+        self.backfill()
+
+    def is_built(self, name: str) -> bool:
+        doc = self.db.meta.find_one({"_id": "built"})
+        return bool(doc and doc.get(name))
+
+    def mark_built(self, name: str) -> None:
+        self.db.meta.update_one({"_id": "built"}, {"$set": {name: True}}, upsert=True)
+
+    def save(self, docs: List[Document]) -> List[Document]:
+        import pymongo
+
+        docs = [doc | {"schema_version": SCHEMA_VERSION} for doc in docs]
+        inserted = docs
+        try:
+            self.db.games.insert_many(docs, ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY for error in errors):
+                raise
+            duplicates = {error["index"] for error in errors}
+            inserted = [doc for index, doc in enumerate(docs) if index not in duplicates]
+        if inserted:
+            self.update_standings(inserted)
+            self.update_head_to_head(inserted)
+            self.bump_version()
+        return inserted
+
+    def update_standings(self, docs: List[Document]) -> None:
+        """
+        Apply these games to the materialized per-model standings, in a single round trip
+        This is O(1) per game, so the leaderboard never needs to replay the full history
+        :param docs: the games that have just been saved
+        """
+        import pymongo
+
+        updates = [
+            pymongo.UpdateOne(
+                {"llm": result["llm"]},
+                {"$inc": Standing.increments(result["rank"], result["coins"])},
+                upsert=True,
+            )
+            for doc in docs
+            for result in doc["results"]
+        ]
+        if updates:
+            self.db.standings.bulk_write(updates, ordered=False)
+
+    def update_head_to_head(self, docs: List[Document]) -> None:
+        """
+        Apply these games to the materialized head-to-head pairs, in a single round trip
+        :param docs: the games that have just been saved
+        """
+        import pymongo
+
+        updates = [
+            pymongo.UpdateOne({"a": a, "b": b}, {"$inc": change}, upsert=True)
+            for doc in docs
+            for a, b, change in head_to_head.increments(doc)
+        ]
+        if updates:
+            self.db.head_to_head.bulk_write(updates, ordered=False)
+
+    def count(self) -> int:
+        """
+        Use the collection metadata rather than counting documents; this doesn't scan the collection
+        """
+        return self.db.games.estimated_document_count()
+
+    def version(self) -> int:
+        doc = self.db.meta.find_one({"_id": "version"})
+        return doc["value"] if doc else 0
+
+    def bump_version(self) -> None:
+        self.db.meta.update_one({"_id": "version"}, {"$inc": {"value": 1}}, upsert=True)
+
+    def latest(self, k: int) -> List[Document]:
+        projection = {"_id": 0, "run_date": 1, "results": 1, "game_id": 1}
+        return list(self.db.games.find({}, projection).sort({"run_date": -1}).limit(k))
+
+    def latest_winners(self, k: int) -> List[Tuple[datetime, List[str], Optional[str]]]:
+        """
+        The server picks out the winners, so only the dates, ids and winning model names are transferred
+        """
+        docs = self.db.games.aggregate(pipelines.latest_winners(k))
+        return [(doc["run_date"], doc["winners"], doc.get("game_id")) for doc in docs]
+
+    def iterate(self, after: Any = None, results_only: bool = False) -> Iterator[Tuple[Any, Document]]:
+        """
+        Only 1 batch is held in memory at a time, however large the collection grows
+        """
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        if results_only:
+            projection = {"run_date": 1, "game_id": 1, "results.llm": 1, "results.rank": 1}
+        else:
+            projection = None
+        cursor = self.db.games.find(query, projection, batch_size=self.BATCH_SIZE).sort("_id", 1)
+        with cursor:
+            for doc in cursor:
+                yield doc.pop("_id"), doc
+
+    def aggregate(self) -> List[Standing]:
+        """
+        Read the materialized standings; there is 1 small document per model
+        """
+        return [Standing.from_document(doc) for doc in self.db.standings.find({}, {"_id": 0})]
+
+    def rebuild_standings(self) -> List[Standing]:
+        """
+        The aggregation runs on the server and writes its output straight to the standings collection
+        """
+        self.db.games.aggregate(pipelines.standings() + [{"$out": "standings"}])
+        return [Standing.from_document(doc) for doc in self.db.standings.find({}, {"_id": 0})]
+
+    def head_to_head(self) -> List[Document]:
+        return list(self.db.head_to_head.find({}, {"_id": 0}))
+
+    def replace_head_to_head(self, rows: List[Document]) -> None:
+        self.db.head_to_head.delete_many({})
+        if rows:
+            self.db.head_to_head.insert_many(rows)
+        self.bump_version()
+
+    def save_transcripts(self, transcripts: List[Tuple[str, str, bytes]]) -> None:
+        import pymongo
+
+        updates = [
+            pymongo.ReplaceOne({"_id": game_id}, {"codec": codec, "data": data}, upsert=True)
+            for game_id, codec, data in transcripts
+        ]
+        if updates:
+            self.db.transcripts.bulk_write(updates, ordered=False)
+
+    def load_transcript(self, game_id: str) -> Optional[Tuple[str, bytes]]:
+        doc = self.db.transcripts.find_one({"_id": game_id})
+        return (doc["codec"], bytes(doc["data"])) if doc else None
+
+    def load_ratings(self) -> Optional[RatingSnapshot]:
+        doc = self.db.ratings.find_one({"_id": "snapshot"})
+        return RatingSnapshot.from_document(doc) if doc else None
+
+    def rescan_after(self, last_id: Any) -> Any:
+        """
+        ObjectIds are made by each client, so a game can be committed after games with later ids have been
+        checkpointed; the games of the last RESCAN_SECONDS before the checkpoint are looked at again
+        """
+        from bson import ObjectId
+
+        if last_id is None:
+            return None
+        return ObjectId.from_datetime(last_id.generation_time - timedelta(seconds=self.RESCAN_SECONDS))
+
+    def save_ratings(self, snapshot: RatingSnapshot, previous_games: int, create: bool) -> bool:
+        import pymongo
+
+        try:
+            update = self.db.ratings.replace_one(
+                {"_id": "snapshot", "games": previous_games},
+                snapshot.to_document(),
+                upsert=create,
+            )
+        except pymongo.errors.DuplicateKeyError:
+            return False
+        return update.matched_count > 0 or update.upserted_id is not None
+
+    def add_rating_history(self, points: List[RatingPoint]) -> None:
+        if points:
+            self.db.rating_history.insert_many([point.model_dump() for point in points], ordered=False)
+
+    def rating_history(self, llm: str) -> List[Tuple[datetime, float]]:
+        projection = {"_id": 0, "run_date": 1, "skill": 1}
+        docs = self.db.rating_history.find({"llm": llm}, projection).sort("run_date", 1)
+        return [(doc["run_date"], doc["skill"]) for doc in docs]
+
+    def clear_ratings(self) -> None:
+        self.db.ratings.delete_many({})
+        self.db.rating_history.delete_many({})
+        self.bump_version()
+
+    def reset(self) -> None:
+        self.db.games.delete_many({})
+        self.db.standings.delete_many({})
+        self.db.head_to_head.delete_many({})
+        self.db.transcripts.delete_many({})
+        self.clear_ratings()
+
+
+class SQLiteStore(Store):
+    """
+    Games recorded in a local SQLite file, so that tournaments can be recorded and ranked on a single box
+    with no external service. Results are kept in an indexed table, and the rankings use SQL aggregation.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        game_id TEXT UNIQUE,
+        run_date TEXT NOT NULL,
+        schema_version INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS games_run_date ON games (run_date DESC);
+    CREATE TABLE IF NOT EXISTS results (
+        game INTEGER NOT NULL REFERENCES games (id),
+        name TEXT NOT NULL,
+        llm TEXT NOT NULL,
+        coins INTEGER NOT NULL,
+        rank INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS results_game ON results (game);
+    CREATE INDEX IF NOT EXISTS results_llm ON results (llm, rank);
+    CREATE TABLE IF NOT EXISTS standings (
+        llm TEXT PRIMARY KEY,
+        games INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        coins INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS standing_ranks (
+        llm TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (llm, rank)
+    );
+    CREATE TABLE IF NOT EXISTS ratings (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_id INTEGER,
+        snapshot TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS rating_history (
+        llm TEXT NOT NULL,
+        run_date TEXT NOT NULL,
+        mu REAL NOT NULL,
+        sigma REAL NOT NULL,
+        skill REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS rating_history_llm ON rating_history (llm, run_date);
+    CREATE TABLE IF NOT EXISTS alliances (
+        game INTEGER NOT NULL REFERENCES games (id),
+        a TEXT NOT NULL,
+        b TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS alliances_game ON alliances (game);
+    CREATE TABLE IF NOT EXISTS head_to_head (
+        a TEXT NOT NULL,
+        b TEXT NOT NULL,
+        games INTEGER NOT NULL,
+        ahead INTEGER NOT NULL,
+        coin_diff INTEGER NOT NULL,
+        alliances INTEGER NOT NULL,
+        PRIMARY KEY (a, b)
+    );
+    CREATE TABLE IF NOT EXISTS transcripts (
+        game_id TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO counters (name, value) SELECT 'games', COUNT(*) FROM games;
+    INSERT OR IGNORE INTO counters (name, value) VALUES ('version', 0);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        SQLite connections can't be shared between threads, so each thread gets its own
+        :return: the connection for the calling thread
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def prepare(self) -> None:
+        with self.connection as connection:
+            connection.executescript(self.SCHEMA)
+        self.backfill()
+
+    def is_built(self, name: str) -> bool:
+        """
+        Markers are kept alongside the counters
+        """
+        row = self.connection.execute("SELECT value FROM counters WHERE name = ?", (f"built:{name}",)).fetchone()
+        return bool(row and row[0])
+
+    def mark_built(self, name: str) -> None:
+        with self.connection as connection:
+            connection.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, 1)", (f"built:{name}",))
+
+    def save(self, docs: List[Document]) -> List[Document]:
+        inserted = []
+        with self.connection as connection:
+            for doc in docs:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO games (game_id, run_date, schema_version) VALUES (?, ?, ?)",
+                    (doc.get("game_id"), doc["run_date"].isoformat(), SCHEMA_VERSION),
+                )
+                if cursor.rowcount == 0:
+                    continue
+                rows = [
+                    (cursor.lastrowid, r["name"], r["llm"], r["coins"], r["rank"])
+                    for r in doc["results"]
+                ]
+                connection.executemany(
+                    "INSERT INTO results (game, name, llm, coins, rank) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                connection.executemany(
+                    "INSERT INTO alliances (game, a, b) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, a, b) for a, b in doc.get("alliances", [])],
+                )
+                self.update_standings(connection, doc)
+                self.update_head_to_head(connection, doc)
+                inserted.append(doc)
+            if inserted:
+                connection.execute(
+                    "UPDATE counters SET value = value + ? WHERE name = 'games'", (len(inserted),)
+                )
+                self.bump_version(connection)
+        return inserted
+
+    @staticmethod
+    def update_standings(connection: sqlite3.Connection, doc: Document) -> None:
+        """
+        Apply 1 game to the materialized per-model standings; this is O(1) per game
+        :param connection: the connection, within the transaction that recorded the game
+        :param doc: the game that has just been recorded
+        """
+        for result in doc["results"]:
+            llm, rank, coins = result["llm"], result["rank"], result["coins"]
+            connection.execute(
+                "INSERT INTO standings (llm, games, wins, coins) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT (llm) DO UPDATE SET games = games + 1, wins = wins + excluded.wins, "
+                "coins = coins + excluded.coins",
+                (llm, 1 if rank == 0 else 0, coins),
+            )
+            connection.execute(
+                "INSERT INTO standing_ranks (llm, rank, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (llm, rank) DO UPDATE SET count = count + 1",
+                (llm, rank),
+            )
+
+    @staticmethod
+    def update_head_to_head(connection: sqlite3.Connection, doc: Document) -> None:
+        """
+        Apply 1 game to the materialized head-to-head pairs
+        :param connection: the connection, within the transaction that recorded the game
+        :param doc: the game that has just been recorded
+        """
+        rows = [
+            (a, b, change["games"], change["ahead"], change["coin_diff"], change["alliances"])
+            for a, b, change in head_to_head.increments(doc)
+        ]
+        connection.executemany(
+            "INSERT INTO head_to_head (a, b, games, ahead, coin_diff, alliances) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (a, b) DO UPDATE SET games = games + excluded.games, ahead = ahead + excluded.ahead, "
+            "coin_diff = coin_diff + excluded.coin_diff, alliances = alliances + excluded.alliances",
+            rows,
+        )
+
+    def count(self) -> int:
+        """
+        A counter is maintained as games are saved, so this doesn't scan the table
+        """
+        row = self.connection.execute("SELECT value FROM counters WHERE name = 'games'").fetchone()
+        return row[0] if row else 0
+
+    def version(self) -> int:
+        row = self.connection.execute("SELECT value FROM counters WHERE name = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, connection: Optional[sqlite3.Connection] = None) -> None:
+        """
+        :param connection: the connection, if this is part of a transaction that changed the data
+        """
+        if connection:
+            connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'version'")
+        else:
+            with self.connection as connection:
+                self.bump_version(connection)
+
+    def results_for(self, ids: List[int], results_only: bool = False) -> Dict[int, List[Document]]:
+        """
+        :param ids: the ids of some games
+        :param results_only: if True, only fetch the llm and rank of each result
+        :return: a mapping from game id to its results, in the order they were recorded
+        """
+        columns = "game, llm, rank" if results_only else "game, llm, rank, name, coins"
+        marks = ", ".join("?" * len(ids))
+        query = f"SELECT {columns} FROM results WHERE game IN ({marks}) ORDER BY rowid"
+        results = {game: [] for game in ids}
+        for row in self.connection.execute(query, ids):
+            result = {"llm": row[1], "rank": row[2]}
+            if not results_only:
+                result |= {"name": row[3], "coins": row[4]}
+            results[row[0]].append(result)
+        return results
+
+    def documents(self, rows: List[Tuple], results_only: bool = False) -> List[Tuple[int, Document]]:
+        """
+        :param rows: (id, game_id, run_date) rows from the games table
+        :param results_only: if True, the results only include the llm and rank
+        :return: (id, document) pairs for these games
+        """
+        ids = [row[0] for row in rows]
+        results = self.results_for(ids, results_only)
+        alliances = {id: [] for id in ids}
+        if not results_only:
+            query = f"SELECT game, a, b FROM alliances WHERE game IN ({', '.join('?' * len(ids))})"
+            for game, a, b in self.connection.execute(query, ids):
+                alliances[game].append([a, b])
+        return [
+            (
+                id,
+                {
+                    "run_date": datetime.fromisoformat(run_date),
+                    "game_id": game_id,
+                    "results": results[id],
+                    "alliances": alliances[id],
+                },
+            )
+            for id, game_id, run_date in rows
+        ]
+
+    def latest(self, k: int) -> List[Document]:
+        query = "SELECT id, game_id, run_date FROM games ORDER BY run_date DESC LIMIT ?"
+        rows = self.connection.execute(query, (k,)).fetchall()
+        return [doc for _, doc in self.documents(rows)]
+
+    def latest_winners(self, k: int) -> List[Tuple[datetime, List[str], Optional[str]]]:
+        return [
+            (doc["run_date"], [r["llm"] for r in doc["results"] if r["rank"] == 0], doc["game_id"])
+            for doc in self.latest(k)
+        ]
+
+    def iterate(self, after: Any = None, results_only: bool = False) -> Iterator[Tuple[Any, Document]]:
+        """
+        Page through the games by id, so only 1 batch is held in memory at a time
+        """
+        last = after if after is not None else 0
+        query = "SELECT id, game_id, run_date FROM games WHERE id > ? ORDER BY id LIMIT ?"
+        while True:
+            rows = self.connection.execute(query, (last, self.BATCH_SIZE)).fetchall()
+            if not rows:
+                return
+            yield from self.documents(rows, results_only)
+            last = rows[-1][0]
+
+    def aggregate(self) -> List[Standing]:
+        connection = self.connection
+        rows = connection.execute("SELECT llm, games, wins, coins FROM standings").fetchall()
+        ranks = {}
+        for llm, rank, count in connection.execute("SELECT llm, rank, count FROM standing_ranks"):
+            ranks.setdefault(llm, {})[str(rank)] = count
+        return [
+            Standing(llm=llm, games=games, wins=wins, coins=coins, ranks=ranks.get(llm, {}))
+            for llm, games, wins, coins in rows
+        ]
+
+    def rebuild_standings(self) -> List[Standing]:
+        """
+        The aggregation is done in SQL using the index on results
+        """
+        with self.connection as connection:
+            connection.execute("DELETE FROM standings")
+            connection.execute("DELETE FROM standing_ranks")
+            connection.execute(
+                "INSERT INTO standings (llm, games, wins, coins) "
+                "SELECT llm, COUNT(*), SUM(rank = 0), SUM(coins) FROM results GROUP BY llm"
+            )
+            connection.execute(
+                "INSERT INTO standing_ranks (llm, rank, count) "
+                "SELECT llm, rank, COUNT(*) FROM results GROUP BY llm, rank"
+            )
+        return self.aggregate()
+
+    def head_to_head(self) -> List[Document]:
+        query = "SELECT a, b, games, ahead, coin_diff, alliances FROM head_to_head"
+        columns = ["a", "b"] + head_to_head.FIELDS
+        return [dict(zip(columns, row)) for row in self.connection.execute(query)]
+
+    def replace_head_to_head(self, rows: List[Document]) -> None:
+        with self.connection as connection:
+            connection.execute("DELETE FROM head_to_head")
+            connection.executemany(
+                "INSERT INTO head_to_head (a, b, games, ahead, coin_diff, alliances) "
+                "VALUES (:a, :b, :games, :ahead, :coin_diff, :alliances)",
+                rows,
+            )
+            self.bump_version(connection)
+
+    def save_transcripts(self, transcripts: List[Tuple[str, str, bytes]]) -> None:
+        with self.connection as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO transcripts (game_id, codec, data) VALUES (?, ?, ?)", transcripts
+            )
+
+    def load_transcript(self, game_id: str) -> Optional[Tuple[str, bytes]]:
+        query = "SELECT codec, data FROM transcripts WHERE game_id = ?"
+        return self.connection.execute(query, (game_id,)).fetchone()
+
+    def load_ratings(self) -> Optional[RatingSnapshot]:
+        row = self.connection.execute("SELECT snapshot FROM ratings WHERE id = 1").fetchone()
+        return RatingSnapshot.model_validate_json(row[0]) if row else None
+
+    def save_ratings(self, snapshot: RatingSnapshot, previous_games: int, create: bool) -> bool:
+        with self.connection as connection:
+            if create:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO ratings (id, last_id, snapshot) VALUES (1, ?, ?)",
+                    (snapshot.last_id, snapshot.model_dump_json()),
+                )
+            else:
+                cursor = connection.execute(
+                    "UPDATE ratings SET last_id = ?, snapshot = ? "
+                    "WHERE id = 1 AND json_extract(snapshot, '$.games') = ?",
+                    (snapshot.last_id, snapshot.model_dump_json(), previous_games),
+                )
+        return cursor.rowcount == 1
+
+    def add_rating_history(self, points: List[RatingPoint]) -> None:
+        rows = [(p.llm, p.run_date.isoformat(), p.mu, p.sigma, p.skill) for p in points]
+        with self.connection as connection:
+            connection.executemany(
+                "INSERT INTO rating_history (llm, run_date, mu, sigma, skill) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def rating_history(self, llm: str) -> List[Tuple[datetime, float]]:
+        query = "SELECT run_date, skill FROM rating_history WHERE llm = ? ORDER BY run_date"
+        return [(datetime.fromisoformat(when), skill) for when, skill in self.connection.execute(query, (llm,))]
+
+    def clear_ratings(self) -> None:
+        with self.connection as connection:
+            connection.execute("DELETE FROM ratings")
+            connection.execute("DELETE FROM rating_history")
+            self.bump_version(connection)
+
+    def reset(self) -> None:
+        with self.connection as connection:
+            tables = ["results", "alliances", "games", "standings", "standing_ranks", "head_to_head", "transcripts"]
+            for table in tables + ["ratings", "rating_history"]:
+                connection.execute(f"DELETE FROM {table}")
+            connection.execute("UPDATE counters SET value = 0 WHERE name = 'games'")
+            self.bump_version(connection)
@@ -0,0 +1,69 @@
+"""
+Full transcripts of games: every strategy, message and alliance of every player, turn by turn.
+Transcripts are compressed and stored apart from the game results, referenced by game id, and are only loaded
+when someone drills into a game, so that leaderboard queries never pay for them.
+zstd is used if the zstandard package is installed, otherwise gzip from the standard library.
+"""
+
+import gzip
+import json
+from typing import Any, Dict, List, Self, Tuple
+from pydantic import BaseModel
+from models.records import TurnRecord
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class PlayerTranscript(BaseModel):
+    """
+    Everything that 1 player did and received during a game
+    """
+
+    name: str
+    llm: str
+    temperature: float
+    records: List[Dict[str, Any]]
+
+    def turn_records(self) -> List[TurnRecord]:
+        """
+        :return: the TurnRecords of this player, in turn order
+        """
+        return [TurnRecord.from_dict(record) for record in self.records]
+
+
+class Transcript(BaseModel):
+    """
+    The full transcript of a game
+    """
+
+    game_id: str
+    players: List[PlayerTranscript]
+
+    def compress(self) -> Tuple[str, bytes]:
+        """
+        :return: the name of the codec, and the compressed JSON of this transcript
+        """
+        data = self.model_dump_json().encode("utf-8")
+        if zstandard:
+            return "zstd", zstandard.ZstdCompressor(level=9).compress(data)
+        return "gzip", gzip.compress(data, compresslevel=9)
+
+    @classmethod
+    def decompress(cls, codec: str, data: bytes) -> Self:
+        """
+        :param codec: the name of the codec that compressed the data
+        :param data: the compressed JSON
+        :return: the Transcript
+        """
+        if codec == "zstd":
+            if not zstandard:
+                raise RuntimeError("This transcript needs the zstandard package to read it")
+            raw = zstandard.ZstdDecompressor().decompress(data)
+        elif codec == "gzip":
+            raw = gzip.decompress(data)
+        else:
+            raise ValueError(f"Unknown transcript codec {codec}")
+        return cls.model_validate(json.loads(raw))
@@ -0,0 +1,280 @@
+"""
+Write-behind persistence for finished games, so that the end of a game never waits on the database
+Games and their transcripts are queued in process and a background thread saves them in batches.
+If the database can't be reached, the batch is spilled to a local journal file, and the journal is
+replayed, with backoff, until the database is back. Every game carries a game_id, so a replay that
+overlaps an earlier partial write doesn't record a game twice.
+"""
+
+import os
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+import contextlib
+from typing import Iterator, List, Optional, Self
+from pydantic import BaseModel
+from models.games import Game
+from models.transcripts import Transcript
+from util import metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class Pending(BaseModel):
+    """
+    A game waiting to be saved, with its transcript if there is one
+    """
+
+    game: Game
+    transcript: Optional[Transcript] = None
+
+
+class GameWriter:
+    """
+    A queue of games waiting to be saved, with a background thread that flushes it
+    Use GameWriter.instance() to get the 1 writer for this process, then submit() games to it
+    """
+
+    journal_path: str
+    games: queue.Queue
+    backoff: float
+    retry_at: float
+    thread: threading.Thread
+
+    BATCH_SIZE = 100
+    LINGER = 0.5
+    INITIAL_BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+    DEFAULT_JOURNAL = "outsmart_journal.jsonl"
+
+    _instance: Optional[Self] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, journal_path: str):
+        """
+        Create a new writer and start its background thread
+        :param journal_path: the local file to spill games to while the database is unavailable
+        """
+        self.journal_path = journal_path
+        self.games = queue.Queue()
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.journal_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="game-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def instance(cls) -> Self:
+        """
+        :return: the writer for this process, creating it on first use
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                path = os.getenv("OUTSMART_JOURNAL", cls.DEFAULT_JOURNAL)
+                cls._instance = cls(path)
+            return cls._instance
+
+    def submit(self, game: Game, transcript: Optional[Transcript] = None) -> None:
+        """
+        Queue a game to be saved; this returns immediately
+        :param game: the finished game
+        :param transcript: the full transcript of the game, if it should be kept
+        """
+        if not game.game_id:
+            game.game_id = transcript.game_id if transcript else uuid.uuid4().hex
+        self.games.put(Pending(game=game, transcript=transcript))
+
+    def next_batch(self) -> List[Pending]:
+        """
+        Wait for a game to arrive, then collect any others that follow shortly after it, up to a full batch
+        While backing off, stop waiting when it's time to retry the journal
+        :return: the games to save next, which may be none
+        """
+        timeout = max(self.retry_at - time.monotonic(), 0.0) if self.backoff else None
+        try:
+            batch = [self.games.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.BATCH_SIZE:
+            try:
+                batch.append(self.games.get(timeout=self.LINGER))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self) -> None:
+        """
+        The body of the background thread: save batches as they arrive, and replay anything in the journal
+        While the database is failing, new batches go straight to the journal until the next retry succeeds
+        """
+        while True:
+            batch = []
+            try:
+                if time.monotonic() >= self.retry_at:
+                    self.replay_journal()
+                batch = self.next_batch()
+                if batch and (self.backoff or not self.save(batch)):
+                    self.spill(batch)
+            except Exception:
+                logger.exception("The game writer failed; retrying later")
+                if batch:
+                    logger.error(f"{len(batch)} games could be neither saved nor journaled")
+                self.back_off()
+            finally:
+                for _ in batch:
+                    self.games.task_done()
+
+    def back_off(self) -> None:
+        """
+        Wait longer before the next retry of the journal, up to MAX_BACKOFF
+        """
+        self.backoff = min(max(self.backoff * 2, self.INITIAL_BACKOFF), self.MAX_BACKOFF)
+        self.retry_at = time.monotonic() + self.backoff
+
+    def save(self, batch: List[Pending]) -> bool:
+        """
+        Try to save a batch of games, and their transcripts, to the database
+        Transcripts replace any already saved for the same game, so retrying a batch is safe
+        :param batch: the games
+        :return: True if they were saved
+        """
+        start = time.perf_counter()
+        try:
+            inserted = Game.save_many([pending.game for pending in batch])
+            Game.save_transcripts([pending.transcript for pending in batch if pending.transcript])
+            metrics.SAVE_SECONDS.observe(time.perf_counter() - start, outcome="ok")
+            logger.info(f"Saved {inserted} of {len(batch)} games")
+            self.backoff = 0.0
+            return True
+        except Exception as e:
+            metrics.SAVE_SECONDS.observe(time.perf_counter() - start, outcome="error")
+            self.back_off()
+            logger.error(f"Failed to save {len(batch)} games; retrying in {self.backoff:.0f}s")
+            logger.error(e)
+            return False
+
+    def spill(self, batch: List[Pending]) -> None:
+        """
+        Append games to the local journal so that they survive until the database is available
+        :param batch: the games
+        """
+        with self.locked():
+            with open(self.journal_path, "a+", encoding="utf-8") as f:
+                if f.tell() and not self.ends_with_newline():
+                    f.write("\n")
+                for pending in batch:
+                    f.write(pending.model_dump_json() + "\n")
+
+    def ends_with_newline(self) -> bool:
+        """
+        :return: False if the journal's last line was cut short, so that the next line mustn't be appended to it
+        """
+        with open(self.journal_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def read_journal(self) -> List[str]:
+        """
+        :return: the lines of the journal, oldest first
+        """
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            return [line for line in f if line.strip()]
+
+    def parse(self, lines: List[str]) -> List[Pending]:
+        """
+        Read games from lines of the journal, moving any line that can't be read, such as one cut short by a
+        crash mid-append, to a .bad file alongside the journal
+        Journals written before transcripts were kept hold bare games, which are read without a transcript
+        :param lines: lines of the journal
+        :return: the games that could be read
+        """
+        games = []
+        bad = []
+        for line in lines:
+            try:
+                games.append(Pending.model_validate_json(line))
+            except ValueError:
+                try:
+                    games.append(Pending(game=Game.model_validate_json(line)))
+                except ValueError:
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            logger.error(f"Moved {len(bad)} unreadable lines of the journal to {self.journal_path}.bad")
+            with open(self.journal_path + ".bad", "a", encoding="utf-8") as f:
+                f.writelines(bad)
+        return games
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Hold the journal against the other threads of this process, and against the other processes that share it,
+        such as the app and the workers, with a lock on a file beside it where the platform supports one
+        """
+        with self.journal_lock, open(self.journal_path + ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def replay_journal(self) -> None:
+        """
+        If the journal has games in it, try to save them, oldest first
+        The journal is held until it's been replayed and removed, so that no other process can spill to it in
+        between; newly submitted games keep queueing up in memory meanwhile
+        """
+        with self.locked():
+            if not os.path.exists(self.journal_path):
+                return
+            lines = self.read_journal()
+            journaled = self.parse(lines)
+            if len(journaled) < len(lines):
+                with open(self.journal_path + ".tmp", "w", encoding="utf-8") as f:
+                    f.writelines(pending.model_dump_json() + "\n" for pending in journaled)
+                os.replace(self.journal_path + ".tmp", self.journal_path)
+            for start in range(0, len(journaled), self.BATCH_SIZE):
+                if not self.save(journaled[start : start + self.BATCH_SIZE]):
+                    return
+            os.remove(self.journal_path)
+        logger.info(f"Replayed {len(journaled)} games from the journal")
+
+    def pending(self) -> int:
+        """
+        :return: the number of games waiting in memory
+        """
+        return self.games.qsize()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """
+        Wait until every game submitted so far has been saved, or spilled to the journal
+        :param timeout: the most seconds to wait
+        :return: True if nothing is left in flight
+        """
+        deadline = time.monotonic() + timeout
+        with self.games.all_tasks_done:
+            while self.games.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.games.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        """
+        At exit, spill anything still queued to the journal, to be replayed by the next process
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self.games.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self.spill(batch)
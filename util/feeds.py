@@ -0,0 +1,337 @@
+"""
+A read-only feed of events for each game, served to spectators over server-sent events (SSE)
+Set OUTSMART_FEED_PORT, or pass --feed-port to the headless runner or the workers, and every game played by this
+process publishes its events to a small asyncio server on that port. Viewers connect to /games/<game_id>/events,
+with an EventSource in a browser or curl -N; /games lists the games with a feed.
+
+Each game keeps its last CAPACITY events in a ring buffer, so viewers who join late catch up straight away, and
+viewers who reconnect with a Last-Event-ID only get what they missed. Each event is encoded once, however many
+viewers there are, and watching costs no LLM calls and no Streamlit reruns.
+Once a game is over and its viewers have caught up, the stream ends, and a reconnect gets a 204 so that browsers
+stop retrying.
+Worker processes don't serve feeds of their own: they forward their events through the job queue to the app,
+which serves every game's feed from 1 port.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+ENV = "OUTSMART_FEED_PORT"
+CAPACITY = 256
+MAX_GAMES = 1000
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+FINAL = "game_over"
+
+
+class Event:
+    """
+    1 event in a game's feed, encoded once in the SSE wire format
+    """
+
+    id: int
+    kind: str
+    encoded: bytes
+
+    def __init__(self, id: int, kind: str, data: Dict[str, Any]):
+        self.id = id
+        self.kind = kind
+        self.encoded = f"id: {id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class Feed:
+    """
+    The events of 1 game, in a ring buffer, with a way for viewers on the server's event loop to wait for more
+    Events are published from the game's threads; waiters are only touched on the event loop
+    """
+
+    game_id: str
+    events: Deque[Event]
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.events = deque(maxlen=CAPACITY)
+        self.next_id = 1
+        self.is_over = False
+        self.updated = time.time()
+        self.lock = threading.Lock()
+        self.waiter: Optional[asyncio.Future] = None
+
+    def append(self, kind: str, data: Dict[str, Any]) -> None:
+        with self.lock:
+            self.events.append(Event(self.next_id, kind, data))
+            self.next_id += 1
+            self.is_over = self.is_over or kind == FINAL
+            self.updated = time.time()
+
+    def since(self, last_id: int) -> List[Event]:
+        """
+        :param last_id: the id of the last event that the viewer has seen, or 0 for none
+        :return: the events after it that are still in the buffer
+        """
+        with self.lock:
+            return [event for event in self.events if event.id > last_id]
+
+    def is_finished(self, last_id: int) -> bool:
+        """
+        :return: True if the game is over and the viewer has seen every event
+        """
+        with self.lock:
+            return self.is_over and last_id >= self.next_id - 1
+
+    def wait(self) -> asyncio.Future:
+        """
+        Called on the event loop
+        :return: a future that completes when the next event is published
+        """
+        if self.waiter is None or self.waiter.done():
+            self.waiter = asyncio.get_running_loop().create_future()
+        return self.waiter
+
+    def wake(self) -> None:
+        """
+        Called on the event loop, once an event has been published
+        """
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+
+class Hub:
+    """
+    The feeds of the most recent games, and the SSE server that streams them
+    """
+
+    host: str
+    port: int
+    feeds: "OrderedDict[str, Feed]"
+
+    def __init__(self, port: int, host: str = "0.0.0.0"):
+        """
+        :param port: the port to listen on, or 0 for any free port
+        :param host: the interface to listen on; all of them by default, as spectators are remote
+        """
+        self.host = host
+        self.port = port
+        self.feeds = OrderedDict()
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.started = threading.Event()
+
+    def feed(self, game_id: str) -> Optional[Feed]:
+        with self.lock:
+            return self.feeds.get(game_id)
+
+    def publish(self, game_id: str, kind: str, data: Dict[str, Any]) -> None:
+        """
+        Add an event to a game's feed, creating the feed if this is the game's first event, and wake its viewers
+        :param game_id: the game
+        :param kind: the type of event, such as "turn"
+        :param data: the event, which must be JSON serializable
+        """
+        with self.lock:
+            feed = self.feeds.get(game_id)
+            if feed is None:
+                feed = Feed(game_id)
+                self.feeds[game_id] = feed
+                while len(self.feeds) > MAX_GAMES:
+                    self.feeds.popitem(last=False)
+        feed.append(kind, data)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(feed.wake)
+
+    def games(self) -> List[Dict[str, Any]]:
+        """
+        :return: a summary of each game with a feed, most recent first
+        """
+        with self.lock:
+            feeds = list(self.feeds.values())
+        return [
+            {"game_id": feed.game_id, "events": feed.next_id - 1, "is_over": feed.is_over, "updated": feed.updated}
+            for feed in reversed(feeds)
+        ]
+
+    def start(self) -> None:
+        """
+        Run the server on a background thread, and wait until it's listening
+        """
+        threading.Thread(target=asyncio.run, args=(self.serve(),), name="feed-server", daemon=True).start()
+        self.started.wait()
+
+    async def serve(self) -> None:
+        try:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        except OSError as e:
+            logger.error(f"Unable to serve spectator feeds on port {self.port}")
+            logger.error(e)
+            self.started.set()
+            return
+        self.loop = asyncio.get_running_loop()
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Spectator feeds are being served on port {self.port}")
+        self.started.set()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def stop(self) -> None:
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve 1 HTTP request; a feed holds the connection open until the game is over or the viewer leaves
+        """
+        try:
+            request = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if len(request) < 2 or request[0] != "GET":
+                await self.respond(writer, 405, b"")
+                return
+            parts = [part for part in urlsplit(request[1]).path.split("/") if part]
+            if parts == ["games"]:
+                await self.respond(writer, 200, json.dumps(self.games()).encode("utf-8"), "application/json")
+            elif len(parts) == 3 and parts[0] == "games" and parts[2] == "events":
+                await self.stream(writer, parts[1], int(headers.get("last-event-id") or 0))
+            else:
+                await self.respond(writer, 404, b"")
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str = "text/plain"):
+        reasons = {200: "OK", 204: "No Content", 404: "Not Found", 405: "Method Not Allowed"}
+        writer.write(
+            f"HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+    async def stream(self, writer: asyncio.StreamWriter, game_id: str, last_id: int) -> None:
+        """
+        Send a game's buffered events, then each new one as it's published
+        :param game_id: the game to watch
+        :param last_id: the last event the viewer saw, from the Last-Event-ID header of a reconnect
+        """
+        feed = self.feed(game_id)
+        if feed is None:
+            await self.respond(writer, 404, b"")
+            return
+        if feed.is_finished(last_id):
+            await self.respond(writer, 204, b"")
+            return
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Access-Control-Allow-Origin: *\r\nConnection: keep-alive\r\n\r\n"
+            + f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+        )
+        while True:
+            events = feed.since(last_id)
+            for event in events:
+                writer.write(event.encoded)
+                last_id = event.id
+            await writer.drain()
+            if feed.is_finished(last_id):
+                return
+            if not events:
+                try:
+                    await asyncio.wait_for(asyncio.shield(feed.wait()), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+
+
+Publisher = Callable[[str, str, Dict[str, Any]], None]
+
+UNSET = object()
+_hub: Any = UNSET
+_hub_lock = threading.Lock()
+_forward: Optional[Publisher] = None
+
+
+def hub() -> Optional[Hub]:
+    """
+    Start the feed server on first use, once the environment has been loaded
+    :return: the Hub, or None if spectator feeds are off
+    """
+    global _hub
+    if _hub is not UNSET:
+        return _hub
+    with _hub_lock:
+        if _hub is UNSET:
+            port = os.getenv(ENV)
+            _hub = None
+            if port:
+                _hub = Hub(int(port))
+                _hub.start()
+    return _hub
+
+
+def enable(port: int, host: str = "0.0.0.0") -> Hub:
+    """
+    Turn spectator feeds on from code, such as a command line flag, rather than the environment
+    :param port: the port to listen on
+    :param host: the interface to listen on
+    :return: the running Hub
+    """
+    global _hub
+    with _hub_lock:
+        _hub = Hub(port, host)
+        _hub.start()
+    return _hub
+
+
+def forward(publisher: Publisher) -> None:
+    """
+    Send this process's events elsewhere rather than serving them, such as from a worker to the app through the
+    job queue; this process then never starts a feed server of its own
+    :param publisher: called with the game_id, kind and data of each event
+    """
+    global _hub, _forward
+    with _hub_lock:
+        _hub = None
+        _forward = publisher
+
+
+def is_enabled() -> bool:
+    return _forward is not None or hub() is not None
+
+
+def publish(game_id: str, kind: str, data: Dict[str, Any]) -> None:
+    """
+    Publish an event for a game, if spectator feeds are on
+    :param game_id: the game
+    :param kind: the type of event
+    :param data: the event, which must be JSON serializable
+    """
+    if _forward is not None:
+        _forward(game_id, kind, data)
+        return
+    current = hub()
+    if current is not None:
+        current.publish(game_id, kind, data)
+
+
+def url(game_id: str) -> Optional[str]:
+    """
+    :param game_id: the game
+    :return: where spectators can follow the game, using OUTSMART_FEED_URL as the public address if it's set
+    """
+    current = hub()
+    if current is None:
+        return None
+    base = os.getenv("OUTSMART_FEED_URL", f"http://localhost:{current.port}")
+    return f"{base.rstrip('/')}/games/{game_id}/events"
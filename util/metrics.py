@@ -0,0 +1,236 @@
+"""
+Counters and histograms for the health of the arena and of each provider, in the Prometheus text format
+The metrics are always collected, which costs a dictionary update under a lock; they're exposed over HTTP
+by the headless runner with --metrics-port, for Prometheus to scrape at /metrics.
+There's no dependency on prometheus_client; the exposition format is simple enough to write directly.
+Retries are counted by watching the provider SDKs' own log messages, as the SDKs retry internally.
+"""
+
+import math
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+PROVIDER_LOGGERS = ["openai._base_client", "anthropic._base_client", "groq._base_client"]
+
+
+def label_text(labels: Labels, extra: str = "") -> str:
+    """
+    :return: the labels in the exposition format, such as {model="gpt-5"}
+    """
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def key(labels: Dict[str, str]) -> Labels:
+    """
+    :return: the labels as a hashable key, with their values escaped for the exposition format
+    """
+    return tuple(sorted((name, escape(value)) for name, value in labels.items()))
+
+
+class Counter:
+    """
+    A count that only goes up, per combination of labels
+    """
+
+    name: str
+    help: str
+    values: Dict[Labels, float]
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """
+        :param amount: how much to add
+        :param labels: the labels of the series to add it to
+        """
+        labelled = key(labels)
+        with self.lock:
+            self.values[labelled] = self.values.get(labelled, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{label_text(labels)} {value:g}")
+        return lines
+
+
+class Gauge:
+    """
+    A value that can go up and down, such as the number of sessions held in memory, per combination of labels
+    """
+
+    name: str
+    help: str
+    values: Dict[Labels, float]
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def set(self, value: float, **labels) -> None:
+        """
+        :param value: the new value
+        :param labels: the labels of the series to set
+        """
+        labelled = key(labels)
+        with self.lock:
+            self.values[labelled] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{label_text(labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """
+    The distribution of observed values, such as latencies, per combination of labels
+    """
+
+    name: str
+    help: str
+    buckets: List[float]
+    series: Dict[Labels, List[float]]
+
+    LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120]
+
+    def __init__(self, name: str, help: str, buckets: List[float] = None):
+        self.name = name
+        self.help = help
+        self.buckets = buckets or self.LATENCY_BUCKETS
+        self.series = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        :param value: the observation, such as a number of seconds
+        :param labels: the labels of the series to add it to
+        """
+        labelled = key(labels)
+        with self.lock:
+            counts = self.series.setdefault(labelled, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, counts in sorted(self.series.items()):
+                for bound, count in zip(self.buckets + [math.inf], counts[:-1]):
+                    le = "+Inf" if bound == math.inf else f"{bound:g}"
+                    bucket_labels = label_text(labels, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count:g}")
+                lines.append(f"{self.name}_sum{label_text(labels)} {counts[-1]:g}")
+                lines.append(f"{self.name}_count{label_text(labels)} {counts[-2]:g}")
+        return lines
+
+
+REGISTRY: List = []
+
+TURNS = Counter("outsmart_turns_total", "Turns completed")
+GAMES = Counter("outsmart_games_total", "Games finished")
+MOVES = Counter("outsmart_moves_total", "Moves made, by model and whether the move was valid")
+ALLIANCES = Counter("outsmart_alliances_total", "Alliances formed, counted once for each model in the alliance")
+LLM_SECONDS = Histogram("outsmart_llm_request_seconds", "Time for each LLM to respond, by model and outcome")
+TOKENS = Counter("outsmart_llm_tokens_total", "Tokens used, by model and kind (input or output)")
+COST = Counter("outsmart_llm_cost_dollars_total", "Dollars spent on LLM calls, by model, from the price table")
+RETRIES = Counter("outsmart_llm_retries_total", "Requests retried by a provider's SDK, by provider")
+SAVE_SECONDS = Histogram("outsmart_db_save_seconds", "Time to save a batch of games, by outcome")
+SESSIONS = Gauge("outsmart_sessions", "Browser sessions with an arena, by where it's held (memory or disk)")
+SESSION_MEMORY = Gauge("outsmart_session_memory_bytes", "Estimated memory held by the arenas of sessions in memory")
+SESSION_BYTES = Histogram(
+    "outsmart_session_bytes",
+    "Estimated memory of each arena when it's evicted to disk",
+    [64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6],
+)
+EVICTIONS = Counter("outsmart_session_evictions_total", "Arenas evicted from memory to disk, by reason")
+REHYDRATIONS = Counter("outsmart_session_rehydrations_total", "Arenas loaded back from disk when a session returns")
+
+
+def render() -> str:
+    """
+    :return: every metric in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RetryCounter(logging.Handler):
+    """
+    Counts the "Retrying request" messages that the provider SDKs log when they retry internally
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.getMessage().startswith("Retrying request"):
+            RETRIES.inc(provider=record.name.split(".")[0])
+
+
+def count_retries() -> None:
+    """
+    Watch the provider SDKs' loggers for retries; they log them at INFO level, so logging must be at INFO
+    """
+    for name in PROVIDER_LOGGERS:
+        logger = logging.getLogger(name)
+        if not any(isinstance(handler, RetryCounter) for handler in logger.handlers):
+            logger.addHandler(RetryCounter())
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves the metrics at /metrics
+    """
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve the metrics over HTTP on a background thread
+    :param port: the port to listen on
+    :param host: the interface to listen on; local only by default
+    :return: the running server
+    """
+    count_retries()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
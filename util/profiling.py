@@ -0,0 +1,226 @@
+"""
+On-demand profiling of turns and games, without editing any code
+Set OUTSMART_PROFILE to a directory, or pass --profile to the headless runner, and every turn is run under
+cProfile, with its peak memory allocation tracked by tracemalloc. Each turn is dumped to its own .prof file,
+which can be explored with snakeviz or pstats. When a game ends, the turns are aggregated into a .prof file
+for the whole game, alongside a text report of the top functions and the memory peak of every turn.
+
+Before Python 3.12, cProfile only sees the thread that enabled it, so work on the referee's thread pool is profiled
+by wrapping the worker function with propagate(), and the profiles of every thread are merged for the turn.
+From Python 3.12, cProfile is built on sys.monitoring, so 1 profiler sees every thread, but only 1 can be active
+at a time: propagate() leaves the function alone, and a turn that starts while another is being profiled is run
+without the profiler. Either way, the profile of a turn includes the work of any other turn running at the same time.
+tracemalloc is process-wide, so memory peaks are only meaningful when 1 game runs at a time.
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import contextvars
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ENV = "OUTSMART_PROFILE"
+TOP = 30
+PER_THREAD = sys.version_info < (3, 12)
+
+active: contextvars.ContextVar[Optional["TurnProfile"]] = contextvars.ContextVar("turn_profile", default=None)
+
+
+class TurnProfile:
+    """
+    The profiles of every thread that did work for 1 turn
+    """
+
+    game_id: str
+    turn: int
+    profiles: List[cProfile.Profile]
+
+    def __init__(self, game_id: str, turn: int):
+        self.game_id = game_id
+        self.turn = turn
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.seconds = 0.0
+        self.peak = 0
+
+    def profile(self) -> cProfile.Profile:
+        """
+        :return: a new profiler for the calling thread, which will be merged into this turn
+        """
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        return profile
+
+    def stats(self) -> pstats.Stats:
+        """
+        :return: the merged statistics of every thread
+        """
+        with self.lock:
+            profiles = list(self.profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+class Profiler:
+    """
+    Profiles turns, writes them to a directory, and aggregates them when a game ends
+    """
+
+    directory: str
+    turns: Dict[str, List[Tuple[int, float, int, str]]]
+
+    def __init__(self, directory: str, top: int = TOP):
+        """
+        :param directory: where to write the .prof files and reports
+        :param top: how many functions to list in each report
+        """
+        self.directory = directory
+        self.top = top
+        self.turns = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def path(self, game_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{game_id}-{suffix}")
+
+    def run_turn(self, game_id: str, turn: int, function: Callable[[], Any]) -> Any:
+        """
+        Run 1 turn under the profiler, then dump it and record its time and memory peak
+        :param game_id: the game being played
+        :param turn: the turn number
+        :param function: runs the turn
+        :return: whatever the function returns
+        """
+        turn_profile = TurnProfile(game_id, turn)
+        profile = turn_profile.profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return function()
+        token = active.set(turn_profile)
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            return function()
+        finally:
+            profile.disable()
+            turn_profile.seconds = time.perf_counter() - start
+            turn_profile.peak = tracemalloc.get_traced_memory()[1]
+            active.reset(token)
+            path = self.path(game_id, f"turn{turn:02}.prof")
+            turn_profile.stats().dump_stats(path)
+            with self.lock:
+                self.turns.setdefault(game_id, []).append((turn, turn_profile.seconds, turn_profile.peak, path))
+
+    def finish_game(self, game_id: str) -> Optional[str]:
+        """
+        Aggregate the turns of a game into 1 .prof file and write a report of the top functions
+        :param game_id: the game that has ended
+        :return: the path of the report, or None if no turns were profiled
+        """
+        with self.lock:
+            turns = self.turns.pop(game_id, [])
+        if not turns:
+            return None
+        stats = pstats.Stats(*[path for _, _, _, path in turns])
+        stats.dump_stats(self.path(game_id, "game.prof"))
+        report = io.StringIO()
+        report.write(f"Profile of game {game_id}\n\n")
+        report.write(f"{'turn':>4} {'seconds':>10} {'peak MB':>10}\n")
+        for turn, seconds, peak, _ in turns:
+            report.write(f"{turn:>4} {seconds:>10.3f} {peak / 1e6:>10.2f}\n")
+        report.write(f"\nTop {self.top} functions by cumulative time, across all threads and turns\n")
+        stats.stream = report
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        report.write(f"\nTop {self.top} functions by own time\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        path = self.path(game_id, "report.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        return path
+
+
+UNSET = object()
+_profiler: Any = UNSET
+
+
+def profiler() -> Optional[Profiler]:
+    """
+    Create the Profiler on first use, once the environment has been loaded
+    :return: the Profiler, or None if profiling is off
+    """
+    global _profiler
+    if _profiler is UNSET:
+        directory = os.getenv(ENV)
+        _profiler = Profiler(directory) if directory else None
+    return _profiler
+
+
+def enable(directory: str, top: int = TOP) -> Profiler:
+    """
+    Turn profiling on from code, such as a command line flag, rather than the environment
+    :param directory: where to write the .prof files and reports
+    :param top: how many functions to list in each report
+    :return: the Profiler
+    """
+    global _profiler
+    _profiler = Profiler(directory, top)
+    return _profiler
+
+
+def run_turn(game_id: str, turn: int, function: Callable[[], Any]) -> Any:
+    """
+    Run a turn, under the profiler if profiling is on
+    :param game_id: the game being played
+    :param turn: the turn number
+    :param function: runs the turn
+    :return: whatever the function returns
+    """
+    current = profiler()
+    if current is None:
+        return function()
+    return current.run_turn(game_id, turn, function)
+
+
+def finish_game(game_id: str) -> Optional[str]:
+    """
+    If profiling is on, aggregate the turns of a game that has ended and write its report
+    :param game_id: the game that has ended
+    :return: the path of the report, or None
+    """
+    current = profiler()
+    if current is None:
+        return None
+    return current.finish_game(game_id)
+
+
+def propagate(function: Callable) -> Callable:
+    """
+    Wrap a function that will run on other threads for the current turn, so that its work is profiled too
+    :param function: the function to wrap
+    :return: the wrapped function, or the function itself if no turn is being profiled or the turn's profiler already
+    sees every thread
+    """
+    turn_profile = active.get()
+    if turn_profile is None or not PER_THREAD:
+        return function
+
+    def wrapper(*args, **kwargs):
+        profile = turn_profile.profile()
+        profile.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.disable()
+
+    return wrapper
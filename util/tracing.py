@@ -0,0 +1,208 @@
+"""
+Lightweight tracing of where the time goes during a turn, written in Chrome's trace event format
+Set OUTSMART_TRACE to a file name, such as outsmart_trace.json, then open the file in https://ui.perfetto.dev
+or chrome://tracing to see every phase of every turn laid out against time, 1 row per thread, so that the
+concurrent LLM calls can be compared side by side. When OUTSMART_TRACE isn't set, span() hands back a shared
+object that does nothing, so tracing costs next to nothing.
+
+Usage:
+with tracing.context(game_id=arena.game_id, turn=3):
+    with tracing.span("llm.send", player="Alex", model="gpt-5-nano"):
+        ...
+Attributes set with context() are added to every span inside it, including on worker threads started
+with a function wrapped by propagate().
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+import contextvars
+from typing import Any, Callable, Dict, List, Optional
+
+ENV = "OUTSMART_TRACE"
+FLUSH_EVENTS = 256
+FLUSH_SECONDS = 1.0
+
+attributes: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("trace_attributes", default={})
+
+
+class Tracer:
+    """
+    Collects finished spans and appends them to the trace file
+    The file is a JSON array that is never closed, which the trace viewers accept, so that it can be
+    appended to by a long-running process and is still readable if the process dies
+    """
+
+    path: str
+    events: List[Dict[str, Any]]
+    threads: set
+
+    def __init__(self, path: str):
+        """
+        :param path: the trace file to append to
+        """
+        self.path = path
+        self.events = []
+        self.threads = set()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.origin = time.time_ns() // 1000 - time.perf_counter_ns() // 1000
+        self.last_flush = time.monotonic()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("[\n")
+        atexit.register(self.flush)
+
+    def record(self, name: str, start: int, end: int, attrs: Dict[str, Any]) -> None:
+        """
+        Add a finished span
+        :param name: what was timed
+        :param start: perf_counter_ns when it started
+        :param end: perf_counter_ns when it ended
+        :param attrs: the attributes of the span
+        """
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": self.origin + start // 1000,
+            "dur": (end - start) // 1000,
+            "pid": self.pid,
+            "tid": thread.ident,
+            "args": attrs,
+        }
+        with self.lock:
+            if thread.ident not in self.threads:
+                self.threads.add(thread.ident)
+                name_event = {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread.ident}
+                self.events.append(name_event | {"args": {"name": thread.name}})
+            self.events.append(event)
+            due = len(self.events) >= FLUSH_EVENTS or time.monotonic() - self.last_flush > FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Append the collected events to the trace file
+        """
+        with self.lock:
+            events, self.events = self.events, []
+            self.last_flush = time.monotonic()
+            if events:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(event, default=str) + ",\n" for event in events)
+
+
+class Span:
+    """
+    Times the code inside a with block
+    """
+
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer: Tracer, name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns(), self.attrs)
+
+
+class Context:
+    """
+    Sets attributes for every span inside a with block
+    """
+
+    __slots__ = ("attrs", "token")
+
+    def __init__(self, attrs: Dict[str, Any]):
+        self.attrs = attrs
+        self.token = None
+
+    def __enter__(self):
+        self.token = attributes.set(attributes.get() | self.attrs)
+        return self
+
+    def __exit__(self, *exc):
+        attributes.reset(self.token)
+
+
+class Nothing:
+    """
+    Stands in for a Span or a Context when tracing is off
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NOTHING = Nothing()
+UNSET = object()
+_tracer: Any = UNSET
+
+
+def tracer() -> Optional[Tracer]:
+    """
+    Create the Tracer on first use, once the environment has been loaded
+    :return: the Tracer, or None if tracing is off
+    """
+    global _tracer
+    if _tracer is UNSET:
+        path = os.getenv(ENV)
+        _tracer = Tracer(path) if path else None
+    return _tracer
+
+
+def span(name: str, **attrs):
+    """
+    :param name: what is being timed, such as "llm.send"; the part before the first dot is its category
+    :param attrs: attributes to record with the span, in addition to those of the current context
+    :return: a context manager that times the code inside it
+    """
+    current = _tracer if _tracer is not UNSET else tracer()
+    if current is None:
+        return NOTHING
+    return Span(current, name, attributes.get() | attrs)
+
+
+def context(**attrs):
+    """
+    :param attrs: attributes to add to every span inside the with block, such as game_id and turn
+    :return: a context manager
+    """
+    current = _tracer if _tracer is not UNSET else tracer()
+    if current is None:
+        return NOTHING
+    return Context(attrs)
+
+
+def propagate(function: Callable) -> Callable:
+    """
+    Wrap a function that will run on other threads, such as in a ThreadPoolExecutor, so that it sees the
+    current context's attributes
+    :param function: the function to wrap
+    :return: the wrapped function, or the function itself if tracing is off
+    """
+    current = _tracer if _tracer is not UNSET else tracer()
+    if current is None:
+        return function
+    captured = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        return captured.copy().run(function, *args, **kwargs)
+
+    return wrapper
@@ -1,6 +1,10 @@
 import logging
 from game.arenas import Arena
+from game.loops import Loop
+from models.moves import draft_fields
 import streamlit as st
+from util import tracing
+from views.fragments import live
 from views.headers import display_headers
 from views.sidebars import display_sidebar
 
@@ -11,10 +15,14 @@ class Display:
     """
 
     arena: Arena
+    loop: Loop
 
-    def __init__(self, arena: Arena):
-        self.arena = arena
-        self.progress_container = None
+    def __init__(self, loop: Loop):
+        """
+        :param loop: the game loop for this session, in the background or through the job queue, which holds the arena
+        """
+        self.loop = loop
+        self.arena = loop.arena
 
     @staticmethod
     def display_record(rec) -> None:
@@ -35,6 +43,20 @@ class Display:
             text += f"- :red[Being ganged up on by {alliances}]"
         st.write(text)
 
+    @staticmethod
+    def display_draft(draft: str) -> None:
+        """
+        Describe the response that the player's LLM is streaming right now
+        """
+        labels = {"secret strategy": "Strategy", "give coin to": "Giving to", "take coin from": "Taking from"}
+        text = ":gray[Thinking..]  \n\n"
+        for key, value in draft_fields(draft):
+            if key in labels:
+                text += f"{labels[key]}: {value}  \n\n"
+            else:
+                text += f"- Message to {key}: {value}\n"
+        st.write(text)
+
     @staticmethod
     def display_player_title(each) -> None:
         """
@@ -49,7 +71,7 @@ class Display:
 
     def display_player(self, each) -> None:
         """
-        Show the player, including title, coins, expander and latest turn
+        Show the player, including title, coins, expander and latest turn, or the move being streamed
         """
         self.display_player_title(each)
         st.write(each.llm.model_name)
@@ -59,46 +81,61 @@ class Display:
             st.markdown(
                 f'<p class="small-font">{each.report()}</p>', unsafe_allow_html=True
             )
-        if len(records) > 0:
+        if each.is_thinking:
+            self.display_draft(each.draft)
+        elif len(records) > 0:
             record = records[-1]
             self.display_record(record)
 
     def do_turn(self) -> None:
         """
-        Callback to run a turn, either triggered from the Run Turn button, or automatically if a game is on auto
+        Callback for the Run Turn button, which runs 1 turn in the background
         """
         logging.info("Kicking off turn")
-        progress_text = "Kicking off turn"
-        with self.progress_container.container():
-            bar = st.progress(0.0, text=progress_text)
-        self.arena.do_turn(bar.progress)
-        bar.empty()
+        self.loop.start(turns=1)
 
     def do_auto_turn(self) -> None:
         """
-        Callback to run a turn on automatic mode, after the Run Game button has been pressed
+        Callback for the Run Game button, which runs the rest of the game in the background
         """
-        st.session_state.auto_move = False
-        self.do_turn()
-        if not self.arena.is_game_over:
-            st.session_state.auto_move = True
+        logging.info("Kicking off game")
+        self.loop.start()
 
-    def display_page(self) -> None:
+    def display_progress(self) -> None:
         """
-        Show the full UI, including columns for each player, and handle auto run if the Run Game button was pressed
+        Show the progress of the turn being run, or the error if the game loop failed
         """
-        display_sidebar()
-        display_headers(self.arena, self.do_turn, self.do_auto_turn)
-        self.progress_container = st.empty()
-        player_columns = st.columns(len(self.arena.players))
+        if self.loop.error:
+            st.error(f"The game stopped with an error: {self.loop.error}")
+        if self.loop.is_running:
+            fraction, status = self.loop.progress()
+            st.progress(fraction, text=status or "Kicking off turn")
 
-        for index, player_column in enumerate(player_columns):
-            player = self.arena.players[index]
-            with player_column:
-                inner = st.empty()
-                with inner.container():
-                    self.display_player(player)
-
-        if st.session_state.auto_move:
-            self.do_auto_turn()
+    def display_players(self, polling: bool) -> None:
+        """
+        Show the progress bar and a column for each player
+        This is a fragment, so while a game is running it refreshes by itself without rerunning the page;
+        once the game loop finishes, the whole page is rerun so that the buttons and sidebar catch up
+        :param polling: True if this fragment was drawn while the game loop was running
+        """
+        if polling and not self.loop.is_running:
             st.rerun()
+        with tracing.span("streamlit.render_players", game_id=self.arena.game_id):
+            self.display_progress()
+            player_columns = st.columns(len(self.arena.players))
+            for index, player_column in enumerate(player_columns):
+                player = self.arena.players[index]
+                with player_column:
+                    inner = st.empty()
+                    with inner.container():
+                        self.display_player(player)
+
+    def display_page(self) -> None:
+        """
+        Show the full UI, including columns for each player, which refresh by themselves while a game is running
+        """
+        running = self.loop.is_running
+        with tracing.span("streamlit.render", game_id=self.arena.game_id):
+            display_sidebar()
+            display_headers(self.arena, self.do_turn, self.do_auto_turn, running)
+            live(self.display_players, running)(running)
@@ -0,0 +1,23 @@
+"""
+Parts of the page that refresh on their own while a game runs in the background
+Rather than rerunning the whole script after every turn, the parts that change during a game are drawn in
+fragments, which Streamlit reruns by themselves on a timer while the game loop is busy.
+"""
+
+import streamlit as st
+from typing import Callable
+
+# st.fragment was st.experimental_fragment before Streamlit 1.37
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+REFRESH_SECONDS = 0.5
+
+
+def live(function: Callable, polling: bool) -> Callable:
+    """
+    Wrap a function that draws part of the page as a fragment
+    :param function: the function to wrap
+    :param polling: True if the fragment should refresh itself on a timer, because a game is running
+    :return: the fragment, ready to be called with the function's arguments
+    """
+    return fragment(function, run_every=REFRESH_SECONDS if polling else None)
@@ -1,16 +1,18 @@
 import streamlit as st
 import base64
-from io import BytesIO
 from game.arenas import Arena
+from game.sessions import SessionStore
 from typing import Callable
+from views.fragments import live
 
 
-def display_overview(arena: Arena, do_turn: Callable, do_auto_turn: Callable) -> None:
+def display_overview(arena: Arena, do_turn: Callable, do_auto_turn: Callable, running: bool) -> None:
     """
     Show the top middle sections of the header, including the buttons andlinks
     :param arena: the arena being run
     :param do_turn: callback to run a turn
     :param do_auto_turn: callback to run the game
+    :param running: True if turns are being run in the background, so the buttons to run more are disabled
     """
     st.markdown("<h1 style='text-align: center;'>Outsmart</h1>", unsafe_allow_html=True)
     st.markdown(
@@ -26,14 +28,14 @@ def display_overview(arena: Arena, do_turn: Callable, do_auto_turn: Callable) ->
     with button_columns[0]:
         st.button(
             f"Run Turn {arena.turn}",
-            disabled=arena.is_game_over,
+            disabled=arena.is_game_over or running,
             on_click=do_turn,
             use_container_width=True,
         )
     with button_columns[2]:
         st.button(
             "Run Game",
-            disabled=arena.is_game_over,
+            disabled=arena.is_game_over or running,
             on_click=do_auto_turn,
             use_container_width=True,
         )
@@ -42,19 +44,34 @@ def display_overview(arena: Arena, do_turn: Callable, do_auto_turn: Callable) ->
             "Restart Game",
             use_container_width=True,
         ):
-            del st.session_state.arena
+            SessionStore.instance().discard(st.session_state.session_key)
             st.rerun()
+    url = arena.spectate()
+    if url:
+        st.markdown(
+            f"<p style='text-align: center; font-size:13px;'>Spectators can follow this game's "
+            f"<a href='{url}'>live feed</a></p>",
+            unsafe_allow_html=True,
+        )
 
 
-def display_image() -> None:
+@st.cache_resource
+def image_bytes() -> bytes:
     """
-    Show the image of the game. This needed to be base64 encoded due to Hugging Face not allowing
-    binary files in repos
+    Decode the image of the game, once per process. This needed to be base64 encoded due to Hugging Face
+    not allowing binary files in repos, and the file is over 1MB, so it's too slow to decode on every rerun
+    :return: the image as bytes
     """
     with open("outsmart_image_base64.txt", "r") as f:
         base64_string = f.read()
-    image_data = base64.b64decode(base64_string)
-    st.image(BytesIO(image_data))
+    return base64.b64decode(base64_string)
+
+
+def display_image() -> None:
+    """
+    Show the image of the game
+    """
+    st.image(image_bytes())
 
 
 def display_details(header_container: st.container) -> None:
@@ -86,21 +103,31 @@ def display_chart(arena: Arena, header_container: st.container):
         )
 
 
-def display_headers(arena: Arena, do_turn: Callable, do_auto_turn: Callable) -> None:
+def display_progress_chart(arena: Arena) -> None:
+    """
+    Show the rules before the game starts, and the chart of coins after that
+    This is a fragment, so that it refreshes by itself after each turn while a game is running
+    :param arena: the underlying arena
+    """
+    header_container = st.empty()
+    if arena.turn == 1:
+        display_details(header_container)
+    else:
+        display_chart(arena, header_container)
+
+
+def display_headers(arena: Arena, do_turn: Callable, do_auto_turn: Callable, running: bool) -> None:
     """
     Display the top 3 sections of the page
     :param arena: the underlying arena
     :param do_turn: a callboack to run the next turn
     :param do_auto_turn: a callback to trigger running of the entire game
+    :param running: True if turns are being run in the background
     """
     header_columns = st.columns([1.5, 0.5, 2, 0.2, 1.8])
     with header_columns[0]:
         display_image()
     with header_columns[2]:
-        display_overview(arena, do_turn, do_auto_turn)
+        display_overview(arena, do_turn, do_auto_turn, running)
     with header_columns[4]:
-        header_container = st.empty()
-        if arena.turn == 1:
-            display_details(header_container)
-        else:
-            display_chart(arena, header_container)
+        live(display_progress_chart, running)(arena)
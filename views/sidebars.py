@@ -1,45 +1,123 @@
-import os
 import streamlit as st
 from game.arenas import Arena
-from models.games import Game
+from game.sessions import SessionStore
+from models.games import Game, cache
+from models.head_to_head import METRICS
+from models.stores import Store
 
 
-def display_ranks():
+def display_ranks(rankings):
     st.markdown(
         "<span style='font-size:13px;'>The table is sorted initially by Win %. "
         "This only shows recent versions of models. "
         "The skill ratings use the TrueSkill methodology,"
-        " an ELO-style system for multi-player games.</span>",
+        " an ELO-style system for multi-player games. "
+        "The CI columns show 95% confidence intervals.</span>",
         unsafe_allow_html=True,
     )
     column_config = {
         "LLM": st.column_config.TextColumn(width="small"),
         "Win %": st.column_config.NumberColumn(format="%.1f"),
+        "Win % CI": st.column_config.TextColumn(help="95% credible interval of the win rate"),
+        "Avg Coins": st.column_config.NumberColumn(format="%.1f"),
         "Skill": st.column_config.NumberColumn(format="%.1f"),
+        "Mu CI": st.column_config.TextColumn(help="95% interval of the TrueSkill mean, mu; Skill is mu - 3 sigma"),
     }
-    st.dataframe(data=Arena.rankings(), hide_index=True, column_config=column_config)
+    st.dataframe(data=rankings, hide_index=True, column_config=column_config)
+    display_trend(rankings["LLM"].tolist())
 
 
-def display_latest():
+def display_trend(llms):
+    llm = st.selectbox("Skill over time", llms, index=None, placeholder="Choose a model")
+    if llm:
+        st.line_chart(data=Game.rating_history(llm), x="When", y="Skill", height=200)
+
+
+def display_head_to_head():
+    st.write("Head to head")
+    metric = st.selectbox("Measure", list(METRICS), label_visibility="collapsed")
+    matrix = Arena.head_to_head(metric)
+    fmt = "%d" if metric == "Games together" else "%.1f"
+    column_config = {column: st.column_config.NumberColumn(format=fmt) for column in matrix.columns}
+    st.dataframe(data=matrix, column_config=column_config)
+
+
+def display_latest(latest):
     st.write("Latest games")
     column_config = {
         "When": st.column_config.DatetimeColumn(width="small"),
         "Winner(s)": st.column_config.TextColumn(width="medium"),
     }
-    st.dataframe(data=Arena.latest(), hide_index=True, column_config=column_config)
+    st.dataframe(
+        data=latest, hide_index=True, column_config=column_config, column_order=["When", "Winner(s)"]
+    )
+    display_transcript(latest)
+    display_cache_stats()
+
+
+def display_transcript(latest):
+    games = latest.dropna(subset=["Game"])
+    labels = {row["Game"]: f"{row['When']:%Y-%m-%d %H:%M} - {row['Winner(s)']}" for _, row in games.iterrows()}
+    game_id = st.selectbox(
+        "Game transcript", list(labels), format_func=labels.get, index=None, placeholder="Choose a game"
+    )
+    if game_id:
+        transcript = Game.transcript(game_id)
+        if not transcript:
+            st.write("There's no transcript for this game")
+            return
+        for player in transcript.players:
+            with st.expander(f"{player.name} - {player.llm}"):
+                text = "".join(str(record) for record in player.turn_records()).replace("\n", "<br/>")
+                st.markdown(f'<p class="small-font">{text}</p>', unsafe_allow_html=True)
+
+
+def display_cache_stats():
+    stats = cache.stats()
+    st.markdown(
+        f"<span style='font-size:11px;'>Leaderboard cache: {stats['hit_ratio']:.0%} hit ratio, "
+        f"{stats['misses']:,} computed, {stats['coalesced']:,} coalesced</span>",
+        unsafe_allow_html=True,
+    )
+
+
+def display_session_stats():
+    stats = SessionStore.instance().stats()
+    average = stats["memory"] / stats["in_memory"] if stats["in_memory"] else 0
+    st.markdown(
+        f"<span style='font-size:11px;'>Sessions: {stats['in_memory']:,} in memory "
+        f"({stats['memory'] / 1e6:.1f} MB, {average / 1e3:.0f} KB each), {stats['on_disk']:,} on disk; "
+        f"{stats['evictions']:,} evicted, {stats['rehydrations']:,} rehydrated</span>",
+        unsafe_allow_html=True,
+    )
+
+
+def display_snapshot_age(snapshot, stale):
+    text = f"Rankings updated {snapshot.age()}"
+    if stale:
+        text += " - newer games are being added"
+    st.markdown(f"<span style='font-size:11px;'>{text}</span>", unsafe_allow_html=True)
 
 
 def display_sidebar():
     with st.sidebar:
         st.markdown("### Outsmart Leaderboard")
-        if os.getenv("MONGO_URI"):
+        if Store.is_configured():
             try:
                 st.write(f"There have been {Game.count():,} games recorded.")
-                if st.button("Calculate Rankings"):
-                    display_ranks()
-                    display_latest()
+                refresher = Arena.leaderboard()
+                snapshot = refresher.snapshot
+                if snapshot:
+                    display_snapshot_age(snapshot, refresher.is_stale())
+                    display_ranks(snapshot.frames["rankings"])
+                    display_head_to_head()
+                    display_latest(snapshot.frames["latest"])
+                else:
+                    st.write("The rankings are being calculated in the background.")
+                    st.button("Check again")
             except Exception as e:
                 st.write("Unable to calculate rankings - the database may not be available.")
                 st.write(f"Underlying error was {e}")
         else:
             st.write("LLM rankings aren't available as this app isn't connected to the database")
+        display_session_stats()